@@ -0,0 +1,230 @@
+"""
+    Benchmarks of the simulator throughput and scaling.
+
+    Each benchmark is run over a grid of parameters, and the results are saved as JSON along with the commit and
+    the versions they were measured with, so that they can be compared between commits:
+
+        python scripts/benchmark.py --output before.json
+        python scripts/benchmark.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from space_env import utils  # noqa: E402
+from space_env.envs.space_env import SpaceEnv  # noqa: E402
+from space_env.space.space import Space  # noqa: E402
+from space_env.space.spatial_index import SpatialIndex  # noqa: E402
+from space_env.spacecraft.dynamics import Spacecraft  # noqa: E402
+
+FLEET_SIZES = [2, 20, 200, 2000]
+POLICY_FREQUENCIES = [1, 5, 15]
+RENDER_MODES = [None, "rgb_array"]
+DENSITIES = [1e-5, 1e-4, 1e-3]  # [spacecrafts / m2]
+BATCH_SIZES = [1, 100, 10000]
+
+
+def measure(function, min_time=0.5, min_calls=3):
+    """
+        Call a function repeatedly for a minimum time.
+
+    :param function: the function to call, which may return an integer number of processed items (1 by default)
+    :param min_time: the minimum measurement time [s]
+    :param min_calls: the minimum number of calls
+    :return: the number of calls, the number of processed items and the elapsed time [s]
+    """
+    calls, items, start = 0, 0, time.perf_counter()
+    while calls < min_calls or time.perf_counter() - start < min_time:
+        result = function()
+        items += result if isinstance(result, (int, np.integer)) else 1
+        calls += 1
+    return calls, items, time.perf_counter() - start
+
+
+def populate(count, density, seed=0):
+    """
+        Create a space of randomly placed spacecrafts, in a disc whose radius gives the required density.
+    """
+    space = Space(np_random=np.random.RandomState(seed))
+    radius = np.sqrt(count / (np.pi * density))
+    space.spacecrafts = [Spacecraft.create_random(space, radius=radius) for _ in range(count)]
+    return space
+
+
+def bench_env(min_time, sizes):
+    """
+        Steps per second of SpaceEnv, over fleet sizes, policy frequencies and render modes.
+    """
+    grid = [(count, frequency, None) for count in sizes for frequency in POLICY_FREQUENCIES] + \
+           [(count, 1, mode) for count in sizes for mode in RENDER_MODES if mode]
+    for count, frequency, mode in grid:
+        env = SpaceEnv({"spacecrafts_count": count - 1,
+                        "policy_frequency": frequency,
+                        "offscreen_rendering": True})
+        env.seed(0)
+        env.reset()
+        if mode and not np.any(env.render(mode)):
+            raise RuntimeError("The rendered frames are blank: is the viewer disabled by SDL_VIDEODRIVER=dummy?")
+
+        def step():
+            _, _, terminal, _ = env.step(env.ACTIONS_INDEXES["IDLE"])
+            if mode:
+                env.render(mode)
+            if terminal:
+                env.reset()
+
+        calls, _, elapsed = measure(step, min_time)
+        env.close()
+        yield {"params": {"spacecrafts": count, "policy_frequency": frequency, "render": mode},
+               "calls": calls, "seconds": elapsed, "rate": calls / elapsed, "unit": "steps/s"}
+
+
+def bench_reset(min_time, sizes):
+    """
+        Resets per second of SpaceEnv, over fleet sizes.
+    """
+    for count in sizes:
+        env = SpaceEnv({"spacecrafts_count": count - 1})
+        env.seed(0)
+        calls, _, elapsed = measure(env.reset, min_time)
+        env.close()
+        yield {"params": {"spacecrafts": count}, "calls": calls, "seconds": elapsed, "rate": calls / elapsed,
+               "unit": "resets/s"}
+
+
+def bench_space_step(min_time, sizes):
+    """
+        Simulation steps per second of Space.step, over fleet sizes and collision densities.
+    """
+    for count in sizes:
+        for density in DENSITIES:
+            space = populate(count, density)
+            calls, _, elapsed = measure(lambda: space.step(1 / SpaceEnv.SIMULATION_FREQUENCY), min_time)
+            yield {"params": {"spacecrafts": count, "density": density},
+                   "calls": calls, "seconds": elapsed, "rate": calls / elapsed, "unit": "steps/s",
+                   "crashed": int(space.fleet.crashed[:space.fleet.count].sum())}
+
+
+def bench_neighbours(min_time, sizes):
+    """
+        Neighbour queries per second: the closest spacecrafts of one spacecraft through the cached index of the
+        space, and the k nearest neighbours of every spacecraft from a rebuilt index.
+    """
+    for count in sizes:
+        space = populate(count, DENSITIES[1])
+        ego = space.spacecrafts[0]
+        space.spatial_index  # noqa, build the index
+        calls, _, elapsed = measure(lambda: space.close_spacecrafts_to(ego, 200, count=5, sort=True), min_time)
+        yield {"params": {"query": "close_spacecrafts_to", "spacecrafts": count},
+               "calls": calls, "seconds": elapsed, "rate": calls / elapsed, "unit": "queries/s"}
+
+        positions = space.fleet.position[:space.fleet.count]
+        calls, items, elapsed = measure(lambda: len(SpatialIndex(positions).nearest_neighbours(5, 200)), min_time)
+        yield {"params": {"query": "nearest_neighbours", "spacecrafts": count},
+               "calls": calls, "seconds": elapsed, "rate": items / elapsed, "unit": "queries/s"}
+
+
+def bench_tri_tri_2d(min_time, sizes):
+    """
+        Triangle pairs tested per second by utils.tri_tri_2d, over batch sizes.
+    """
+    rng = np.random.RandomState(0)
+    for batch in BATCH_SIZES:
+        triangles = [utils.triangle_vertices(rng.uniform(-10, 10, (batch, 2)),
+                                             np.full(batch, Spacecraft.LENGTH),
+                                             np.full(batch, Spacecraft.WIDTH),
+                                             rng.uniform(-np.pi, np.pi, batch)) for _ in range(2)]
+        calls, items, elapsed = measure(lambda: np.size(utils.tri_tri_2d(*triangles)), min_time)
+        yield {"params": {"batch": batch}, "calls": calls, "seconds": elapsed, "rate": items / elapsed,
+               "unit": "pairs/s"}
+
+
+def bench_import(min_time, sizes):
+    """
+        Startups per second of a fresh interpreter running `import space_env; gym.make('space-v0')`, which must not
+        load the rendering and compilation dependencies.
+    """
+    code = "import sys, space_env, gym; gym.make('space-v0'); " \
+           "print(','.join(m for m in ('pygame', 'jax', 'matplotlib') if m in sys.modules))"
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    loaded = []
+
+    def start():
+        output = subprocess.check_output([sys.executable, "-c", code], cwd=root, stderr=subprocess.DEVNULL)
+        loaded[:] = [module for module in output.decode().strip().split(",") if module]
+
+    calls, _, elapsed = measure(start, min_time)
+    yield {"params": {"statement": "import space_env; gym.make('space-v0')"}, "calls": calls, "seconds": elapsed,
+           "rate": calls / elapsed, "unit": "startups/s", "loaded": loaded}
+
+
+BENCHMARKS = {
+    "import": bench_import,
+    "env": bench_env,
+    "reset": bench_reset,
+    "space_step": bench_space_step,
+    "neighbours": bench_neighbours,
+    "tri_tri_2d": bench_tri_tri_2d,
+}
+
+
+def metadata():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+                                         cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform()}
+
+
+def compare(results, reference):
+    """
+        Print the ratio of the rates of two runs, for the benchmarks they have in common.
+    """
+    rates = {(r["benchmark"], json.dumps(r["params"], sort_keys=True)): r["rate"] for r in reference["results"]}
+    for r in results:
+        key = (r["benchmark"], json.dumps(r["params"], sort_keys=True))
+        if key in rates:
+            print("{:<12} {:<70} x{:.2f}".format(key[0], key[1], r["rate"] / rates[key]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="the benchmarks to run")
+    parser.add_argument("--sizes", nargs="+", type=int, default=FLEET_SIZES, help="the fleet sizes")
+    parser.add_argument("--min-time", type=float, default=0.5, help="the minimum time of a measure [s]")
+    parser.add_argument("--output", default="benchmark.json", help="the JSON file to save the results to")
+    parser.add_argument("--compare", help="a JSON file of previous results to compare to")
+    args = parser.parse_args()
+
+    # Render without a display, unlike the dummy driver which disables the viewer
+    os.environ.setdefault("SDL_VIDEODRIVER", "offscreen")
+    results = []
+    for name in args.only or BENCHMARKS:
+        for result in BENCHMARKS[name](args.min_time, args.sizes):
+            result = dict(benchmark=name, **result)
+            print("{:<12} {:<70} {:>12.1f} {}".format(name, json.dumps(result["params"]), result["rate"],
+                                                      result["unit"]))
+            results.append(result)
+
+    with open(args.output, "w") as f:
+        json.dump({"metadata": metadata(), "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,7 @@ setup(
     tests_require=['pytest'],
     extras_require={
         'dev': ['scipy'],
+        'log': ['pandas', 'pyarrow'],
         'deploy': ['pytest-runner', 'sphinx<1.7.3', 'sphinx_rtd_theme']
     },
     entry_points={
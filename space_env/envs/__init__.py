@@ -1 +1,3 @@
 from space_env.envs.space_env import *
+from space_env.envs.vec_env import *
+from space_env.envs.subproc_vec_env import *
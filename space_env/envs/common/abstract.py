@@ -1,7 +1,25 @@
+import copy
+from collections import namedtuple
+
 import gym
+import numpy as np
 from gym import spaces
 from gym.utils import seeding
 
+from space_env.envs.common.finite_mdp import finite_mdp
+from space_env.envs.common.observation import observation_factory
+from space_env.profiler import Profiler
+from space_env.spacecraft.behavior import IDMSpacecraft
+from space_env.spacecraft.control import ControlledSpacecraft
+
+
+class EnvState(namedtuple("EnvState", ["spacecrafts", "fleet", "space_time", "time", "steps", "done",
+                                       "random_state"])):
+    """
+        A snapshot of the state of an environment, see AbstractEnv.get_state().
+    """
+    __slots__ = ()
+
 
 class AbstractEnv(gym.Env):
     """
@@ -12,7 +30,7 @@ class AbstractEnv(gym.Env):
     """
     metadata = {'render.modes': ['human', 'rgb_array']}
 
-    ACTIONS = {0:' LEFT',
+    ACTIONS = {0: 'LEFT',
                1: 'IDLE',
                2: 'RIGHT',
                3: 'FASTER',
@@ -24,8 +42,11 @@ class AbstractEnv(gym.Env):
 
     PERCEPTION_DISTANCE = 6.0
 
+    """ Configuration entries the action and observation spaces depend on """
+    SPACES_CONFIG = ("observation", "multi_agent", "controlled_spacecrafts", "policy_frequency")
+
     def __init__(self, config=None):
-        self.config = self.defaulf_config()
+        self.config = self.default_config()
         if config:
             self.config.update(config)
 
@@ -36,13 +57,18 @@ class AbstractEnv(gym.Env):
         # Scene
         self.space = None
         self.spacecraft = None
+        self.controlled_spacecrafts = []
 
         # Spaces
         self.observation = None
+        self.spaces_config = None
         self.action_space = None
         self.observation_space = None
         self.define_spaces()
 
+        # Profiling, enabled at reset
+        self.profiler = None
+
         # Running
         self.time = 0  # Simulation time
         self.steps = 0  # Actions performed
@@ -70,12 +96,22 @@ class AbstractEnv(gym.Env):
             "observation": {
                 "type": "TimeToCollision"
             },
+            "controlled_spacecrafts": 1,
+            "multi_agent": False,
             "policy_frequency": 1,  # [Hz]
-            "other_spacecrafts_type": "space_env.spacecraft.behavior.IDMspacecraft",
+            "simulation_frequency": None,  # [Hz], SIMULATION_FREQUENCY by default
+            "integrator": "euler",
+            "continuous_collisions": False,
+            "log_path": None,  # Parquet file the log of the space is streamed to, rewritten at each reset
+            "other_spacecrafts_type": "space_env.spacecraft.behavior.IDMSpacecraft",
             "screen_width": 600,  # [px]
             "screen_height": 600,  # [px]
             "centering_position": [0.3, 0.5],
-            "show_trajectories": False
+            "show_trajectories": False,
+            "render_substeps": 1,
+            "adaptive_time_step": False,
+            "jit_simulation": False,  # Euler integration without behaviour models, see _simulate_compiled()
+            "profile": False
         }
 
     def seed(self, seed=None):
@@ -87,13 +123,30 @@ class AbstractEnv(gym.Env):
             self.config.update(config)
 
     def define_spaces(self):
-        self.action_space = spaces.Discrete(len(self.ACTIONS))
+        """
+            Define the action and observation spaces.
 
+            In multi-agent mode, an action is picked for each controlled spacecraft, and the configured observation
+            is made by each of them.
+        """
         if "observation" not in self.config:
             raise ValueError("The observation configuration must be defined")
-        self.observation = observation_factory(self, self.config["observation"])
+        if self.config.get("multi_agent"):
+            self.action_space = spaces.MultiDiscrete([len(self.ACTIONS)] * self.config["controlled_spacecrafts"])
+            self.observation = observation_factory(self, {"type": "MultiAgent",
+                                                          "observation_config": self.config["observation"]})
+        else:
+            self.action_space = spaces.Discrete(len(self.ACTIONS))
+            self.observation = observation_factory(self, self.config["observation"])
+        self.spaces_config = self._spaces_config()
         self.observation_space = self.observation.space()
 
+    def _spaces_config(self):
+        """
+        :return: a copy of the configuration entries the spaces depend on, see SPACES_CONFIG
+        """
+        return copy.deepcopy({key: self.config.get(key) for key in self.SPACES_CONFIG})
+
     def _reward(self, action):
         """
             Return the reward associated with performing a given action and ending up in the current state.
@@ -121,6 +174,39 @@ class AbstractEnv(gym.Env):
         """
         raise NotImplementedError
 
+    def _agent_rewards(self, actions):
+        """
+            Return the rewards of the controlled spacecrafts, in multi-agent mode.
+
+        :param actions: the last actions performed, of shape (n_agents,)
+        :return: the rewards, of shape (n_agents,)
+        """
+        raise NotImplementedError
+
+    def _agent_dones(self):
+        """
+            Check whether each controlled spacecraft has reached a terminal state, in multi-agent mode.
+
+        :return: the terminal flags, of shape (n_agents,)
+        """
+        raise NotImplementedError
+
+    def _agent_costs(self, actions):
+        """
+            Return the constraint signals of the controlled spacecrafts, in multi-agent mode.
+
+        :param actions: the last actions performed, of shape (n_agents,)
+        :return: the costs, of shape (n_agents,)
+        """
+        raise NotImplementedError
+
+    def _agent_rows(self):
+        """
+        :return: the fleet indexes of the controlled spacecrafts
+        """
+        self.space.fleet.sync()
+        return np.array([spacecraft.index for spacecraft in self.controlled_spacecrafts], dtype=int)
+
     def reset(self):
         """
             Reset the environment to it's initial configuration
@@ -128,7 +214,16 @@ class AbstractEnv(gym.Env):
         """
         self.time = 0
         self.done = False
-        self.define_spaces()
+        self.SIMULATION_FREQUENCY = self.config.get("simulation_frequency") or type(self).SIMULATION_FREQUENCY
+        if not self.config.get("profile"):
+            self.profiler = None
+        elif self.profiler is None:
+            self.profiler = Profiler()
+        self.space.profiler = self.profiler
+        if self.config.get("jit_simulation"):
+            self._check_compiled_simulation()
+        if self.observation is None or self.spaces_config != self._spaces_config():
+            self.define_spaces()
         return self.observation.observe()
 
     def step(self, action):
@@ -137,64 +232,188 @@ class AbstractEnv(gym.Env):
 
             The action is executed by the ego-spacecraft, and all other spacecrafts perform their default
             behaviour for several simulation timesteps until the next decision making step.
-        :param int action: the action performed by the ego-spacecraft
+
+            In multi-agent mode, the action is an array of the actions of the controlled spacecrafts, and the
+            observation, reward and terminal flag are arrays with one entry per controlled spacecraft. The episode
+            is over when all of them are terminal.
+        :param action: the action performed by the ego-spacecraft, or an array of shape (n_agents,)
         :return: a tuple (observation, reward, terminal, info)
         """
         if self.space is None or self.spacecraft is None:
             raise NotImplementedError("The spacecraft must be initialized in the environment implementation")
 
+        self.steps += 1
         self._simulate(action)
 
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.clock()
         obs = self.observation.observe()
-        reward = self._reward(action)
-        terminal = self._is_terminal()
+        if profiler is not None:
+            start = profiler.lap("observation", start)
+        if self.config.get("multi_agent"):
+            reward = self._agent_rewards(action)
+            terminal = self._agent_dones()
+        else:
+            reward = self._reward(action)
+            terminal = self._is_terminal()
+        if profiler is not None:
+            profiler.lap("reward", start)
+        info = self._info(action)
+        if profiler is not None:
+            info["perf"] = profiler.end_step()
 
-        info = {
-            "velocity": self.spacecraft.velocity,
-            "crashed": self.spacecraft.crashed,
-            "action": action,
-        }
+        return obs, reward, terminal, info
+
+    def _info(self, action):
+        """
+            Return a dictionary of additional information about the step that has just been performed.
+
+        :param action: the last action performed
+        :return: the info dict
+        """
+        if self.config.get("multi_agent"):
+            rows = self._agent_rows()
+            info = {
+                "velocity": self.space.fleet.velocity[rows].copy(),
+                "crashed": self.space.fleet.crashed[rows].copy(),
+                "action": action,
+            }
+            cost = self._agent_costs
+        else:
+            info = {
+                "velocity": self.spacecraft.velocity,
+                "crashed": self.spacecraft.crashed,
+                "action": action,
+            }
+            cost = self._cost
         try:
-            info["cost"] = self._cost(action)
+            info["cost"] = cost(action)
         except NotImplementedError:
             pass
-
-        return obs, reward, terminal, info
+        return info
 
     def _simulate(self, action=None):
         """
             Perform several steps of simulation with constant action
         """
-        for k in range(int(self.SIMULATION_FREQUENCY // self.config["policy_frequency"])):
-            if action is not None and \
-                    self.time % int(self.SIMULATION_FREQUENCY // self.config["policy_frequency"]) == 0:
+        if self.config.get("jit_simulation"):
+            return self._simulate_compiled(action)
+
+        profiler = self.profiler
+        substeps = int(self.SIMULATION_FREQUENCY // self.config["policy_frequency"])
+        dt = 1 / self.SIMULATION_FREQUENCY
+        safe_duration = 0
+        if self.config.get("multi_agent"):
+            # The controlled spacecrafts are controlled at once, and the others act on their own
+            agents = self._agent_rows()
+            others = np.flatnonzero(~np.isin(np.arange(self.space.fleet.count), agents))
+            names = np.array([self.ACTIONS[a] for a in range(len(self.ACTIONS))])
+        for k in range(substeps):
+            if profiler is not None:
+                start = profiler.clock()
+                profiler.count("substeps")
+            first = self.time % int(self.SIMULATION_FREQUENCY // self.config["policy_frequency"]) == 0
+            if self.config.get("multi_agent"):
+                ControlledSpacecraft.act_all(self.space.fleet, agents,
+                                             names[np.asarray(action)] if action is not None and first else None)
+            elif action is not None and first:
                 # Forward action to the spacecraft
                 self.spacecraft.act(self.ACTIONS[action])
-
-            self.space.act()
-            self.space.step(1 / self.SIMULATION_FREQUENCY)
+            if profiler is not None:
+                start = profiler.lap("spacecraft_act", start)
+
+            self.space.act(others if self.config.get("multi_agent") else None)
+            if profiler is not None:
+                profiler.lap("space_act", start)
+
+            # Skip the collision checks while no collision is possible
+            if self.config.get("adaptive_time_step"):
+                if safe_duration < dt:
+                    safe_duration = self.space.safe_duration((substeps - k) * dt, dt)
+                check_collisions = safe_duration < dt
+                safe_duration = 0 if check_collisions else safe_duration - dt
+            else:
+                check_collisions = True
+            self.space.step(dt, check_collisions=check_collisions)
             self.time += 1
 
-            # Automatically render intermediate simulation steps if a viewer has been launched
-            # Ignored if the rendering is done offscreen
-            self._automatic_rendering()
+            # Automatically render intermediate simulation steps if a viewer has been launched, every
+            # render_substeps steps. Ignored if the rendering is done offscreen, unless it is recorded
+            if self.time % self.config.get("render_substeps", 1) == 0:
+                if profiler is not None:
+                    start = profiler.clock()
+                self._automatic_rendering()
+                if profiler is not None:
+                    profiler.lap("rendering", start)
 
             # Stop at terminal states
             if self.done or self._is_terminal():
                 break
         self.enable_auto_render = False
 
-    def render(self, mode='human'):
+    def _simulate_compiled(self, action=None):
+        """
+            Perform all the steps of simulation of a policy step as a single compiled call to functional.simulate().
+
+            Only the final state is rendered, and the spacecrafts behaviours are limited to the ones of the functional
+            simulation: the controlled spacecrafts track their targets and the others repeat their commands. The
+            configurations it cannot reproduce are rejected at reset, see _check_compiled_simulation().
+        """
+        from space_env.space import functional  # Imports jax
+
+        fleet = self.space.fleet
+        fleet.sync()
+        actions = np.full(fleet.count, functional.IDLE)
+        rows = self._agent_rows() if self.config.get("multi_agent") else self.spacecraft.index
+        if action is not None:
+            actions[rows] = action
+        agents = np.zeros(fleet.count, dtype=bool)
+        agents[rows] = True
+        substeps = int(self.SIMULATION_FREQUENCY // self.config["policy_frequency"])
+        state, performed = functional.simulate(functional.from_fleet(fleet),
+                                               actions,
+                                               agents,
+                                               1 / self.SIMULATION_FREQUENCY,
+                                               substeps=substeps)
+        functional.to_fleet(state, fleet)
+        if self.profiler is not None:
+            self.profiler.count("substeps", int(performed))
+        self.space.after_step(int(performed) / self.SIMULATION_FREQUENCY)
+        self.time += int(performed)
+        self._automatic_rendering()
+        self.enable_auto_render = False
+
+    def _check_compiled_simulation(self):
+        """
+            Check that the compiled simulation reproduces the dynamics of the configured space.
+
+            The functional simulation integrates the kinematics with the Euler scheme, only checks the collisions
+            between final poses, records no history and has no behaviour models.
+        """
+        if self.config["integrator"] != "euler":
+            raise ValueError("The compiled simulation only supports the euler integrator")
+        if self.config["continuous_collisions"]:
+            raise ValueError("The compiled simulation does not support continuous collisions")
+        if self.space.record_history:
+            raise ValueError("The compiled simulation does not record the trajectories")
+        fleet = self.space.fleet
+        fleet.sync()
+        if np.any(fleet.behavior[:fleet.count] > 0):
+            raise ValueError("The compiled simulation does not support spacecrafts with a behaviour model")
+
+    def render(self, mode='human', out=None):
         """
             Render the environment.
 
             Create a viewer if none exists, and use it to render an image.
         :param mode: the rendering mode
+        :param out: in 'rgb_array' mode, an array of shape (height, width, 3) to write the image into, if any
         """
         self.rendering_mode = mode
 
         if self.viewer is None:
-            self.viewer = EnvViewer(self, offscreen=self.offscreen)
+            self.viewer = self._create_viewer()
 
         self.enable_auto_render = not self.offscreen
 
@@ -203,23 +422,49 @@ class AbstractEnv(gym.Env):
             self.viewer.display()
 
         if mode == 'rgb_array':
-            image = self.viewer.get_image()
+            image = self.viewer.get_image(out)
             if not self.viewer.offscreen:
                 self.viewer.handle_events()
-            self.viewer.handle_events()
             return image
         elif mode == 'human':
             if not self.viewer.offscreen:
                 self.viewer.handle_events()
         self.should_update_rendering = False
 
+    def start_recording(self, path, fps=None):
+        """
+            Record the rendered frames, including the intermediate simulation steps, see EnvViewer.start_recording().
+
+        :param path: the path of the recorded file, a .npz archive or a video
+        :param fps: the frame rate of videos [Hz]
+        """
+        if self.viewer is None:
+            self.viewer = self._create_viewer()
+        self.viewer.start_recording(path, fps)
+
+    def stop_recording(self):
+        if self.viewer is not None:
+            self.viewer.stop_recording()
+
+    def _create_viewer(self):
+        """
+            Create the environment viewer.
+
+            The graphics modules are only imported here, so that pygame is not loaded by environments that are never
+            rendered.
+        """
+        from space_env.envs.common.graphics import EnvViewer
+        return EnvViewer(self, offscreen=self.offscreen)
+
     def close(self):
         """
             Close the environment.
 
-            Will close the environment viewer if it exists.
+            Will close the log of the space and the environment viewer if they exist.
         """
         self.done = True
+        if self.space is not None:
+            self.space.close()
         if self.viewer is not None:
             self.viewer.close()
         self.viewer = None
@@ -248,7 +493,7 @@ class AbstractEnv(gym.Env):
             If a callback has been set, use it to perform the rendering. This is useful for the environment wrappers
             such as video-recording monitor that need to access these intermediate renderings.
         """
-        if self.viewer is not None and self.enable_auto_render:
+        if self.viewer is not None and (self.enable_auto_render or self.viewer.recorder is not None):
             self.should_update_rendering = True
 
             if self.automatic_rendering_callback:
@@ -256,6 +501,77 @@ class AbstractEnv(gym.Env):
             else:
                 self.render(self.rendering_mode)
 
+    def perf_stats(self):
+        """
+            Aggregate the profiling measures of the steps performed so far.
+
+            Profiling is enabled by the "profile" configuration, and the measures of each step are also reported in
+            its info dict, under "perf".
+
+        :return: the aggregated measures, see Profiler.stats()
+        """
+        if self.profiler is None:
+            raise ValueError("Profiling is disabled, enable it with the \"profile\" configuration")
+        return self.profiler.stats()
+
+    def get_state(self):
+        """
+            Take a snapshot of the environment state.
+
+            The snapshot holds read-only copies of the fleet columns, the simulation counters and the random number
+            generator state: it is much cheaper than a deep copy of the environment, and can be restored any number
+            of times with set_state(). The histories are only included if they are recorded.
+
+        :return: an EnvState
+        """
+        self.space.fleet.sync()
+        return EnvState(spacecrafts=tuple(self.space.spacecrafts),
+                        fleet=self.space.fleet.get_state(history=self.space.record_history),
+                        space_time=self.space.time,
+                        time=self.time,
+                        steps=self.steps,
+                        done=self.done,
+                        random_state=_get_random_state(self.np_random))
+
+    def set_state(self, state):
+        """
+            Restore a snapshot of the environment state, taken with get_state().
+
+            The spacecrafts of the snapshot are restored in the space if they were added or removed since.
+
+        :param state: an EnvState
+        """
+        if len(state.spacecrafts) != len(self.space.spacecrafts) or \
+                any(a is not b for a, b in zip(state.spacecrafts, self.space.spacecrafts)):
+            self.space.spacecrafts = list(state.spacecrafts)
+        self.space.fleet.set_state(state.fleet)
+        self.space.time = state.space_time
+        self.space._spatial_index = None
+        self.time, self.steps, self.done = state.time, state.steps, state.done
+        _set_random_state(self.np_random, state.random_state)
+
+    def clone(self):
+        """
+            Copy the environment, for planning.
+
+            Only the mutable parts are copied: the space and its spacecrafts, as in Space.clone(), the random number
+            generator and the observation. The configuration, action and observation spaces are shared with the
+            original environment, and the clone has no viewer and no profiler.
+
+        :return: the copied environment
+        """
+        env = copy.copy(self)
+        env.viewer = None
+        env.automatic_rendering_callback = None
+        env.enable_auto_render = False
+        env.np_random = _copy_random(self.np_random)
+        env.space = self.space.clone(np_random=env.np_random)
+        env.profiler = env.space.profiler = None
+        env.spacecraft = env.space.spacecrafts[self.spacecraft.index]
+        env.controlled_spacecrafts = [env.space.spacecrafts[v.index] for v in self.controlled_spacecrafts]
+        env.observation = self.observation.clone(env)
+        return env
+
     def simplify(self):
         """
             Return a simplified copy of the environment where distant spacecrafts have been removed from the space.
@@ -264,20 +580,23 @@ class AbstractEnv(gym.Env):
 
         :return: a simplified environment state
         """
-        state_copy = copy.deepcopy(self)
+        state_copy = self.clone()
         state_copy.space.spacecrafts = [state_copy.spacecraft] + state_copy.space.close_spacecrafts_to(
             state_copy.spacecraft, self.PERCEPTION_DISTANCE)
 
         return state_copy
 
     def randomize_behaviour(self):
-        env_copy = copy.deepcopy(self)
+        env_copy = self.clone()
         for v in env_copy.space.spacecrafts:
-            if isinstance(v, IDMspacecraft):
+            if isinstance(v, IDMSpacecraft):
                 v.randomize_behavior()
         return env_copy
 
     def to_finite_mdp(self):
+        """
+            Build a finite MDP of the ego-spacecraft decisions from the current state, see finite_mdp().
+        """
         return finite_mdp(self, time_quantization=1/self.config["policy_frequency"])
 
     def __deepcopy__(self, memo):
@@ -292,4 +611,35 @@ class AbstractEnv(gym.Env):
                 setattr(result, k, copy.deepcopy(v, memo))
             else:
                 setattr(result, k, None)
-        return result
\ No newline at end of file
+        return result
+
+
+def _get_random_state(np_random):
+    """
+        Get the state of a numpy Generator or RandomState.
+    """
+    if isinstance(np_random, np.random.RandomState):
+        return np_random.get_state()
+    return np_random.bit_generator.state
+
+
+def _set_random_state(np_random, state):
+    """
+        Set the state of a numpy Generator or RandomState.
+    """
+    if isinstance(np_random, np.random.RandomState):
+        np_random.set_state(state)
+    else:
+        np_random.bit_generator.state = state
+
+
+def _copy_random(np_random):
+    """
+        Copy a numpy Generator or RandomState, without going through a deep copy.
+    """
+    if isinstance(np_random, np.random.RandomState):
+        result = np.random.RandomState()
+    else:
+        result = np.random.Generator(type(np_random.bit_generator)())
+    _set_random_state(result, _get_random_state(np_random))
+    return result
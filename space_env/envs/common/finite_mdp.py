@@ -0,0 +1,129 @@
+from functools import lru_cache
+
+import numpy as np
+
+from space_env import utils
+
+
+class FiniteMDP(object):
+    """
+        A finite deterministic MDP, described by tables over its states and actions.
+    """
+
+    def __init__(self, transition, reward, terminal, state=0, shape=None):
+        """
+        :param transition: the next state of every (state, action) pair, of shape (S, A)
+        :param reward: the reward of every (state, action) pair, of shape (S, A)
+        :param terminal: whether every state is terminal, of shape (S,)
+        :param state: the index of the current state
+        :param shape: the shape of the grid of discretized states, if any
+        """
+        self.transition = transition
+        self.reward = reward
+        self.terminal = terminal
+        self.state = state
+        self.shape = shape
+
+    def step(self, action):
+        """
+            Perform an action from the current state.
+
+        :param action: the action index
+        :return: a tuple (state, reward, terminal)
+        """
+        reward = self.reward[self.state, action]
+        self.state = self.transition[self.state, action]
+        return self.state, reward, self.terminal[self.state]
+
+
+def finite_mdp(env, time_quantization=1., horizon=10.):
+    """
+        Build a finite MDP of the ego-spacecraft decisions, relative to the other spacecrafts.
+
+        The ego-spacecraft state is discretized into its target heading, as a number of DELTA_HEADING turns from its
+        current target heading, its speed index and the time, quantized by time_quantization. The other spacecrafts
+        are assumed to keep their current velocities, and a state is a collision if the ego-spacecraft, flying
+        straight from its current position with that heading and speed, comes closer than a spacecraft length to
+        one of them during that time interval.
+
+        The collisions of all the (heading, speed, time) states are found at once from the closed-form closest
+        approach of each pair of linear trajectories. The transition table only depends on the grid shape, and is
+        cached.
+
+    :param env: an environment, whose ego-spacecraft is an MDPSpacecraft
+    :param time_quantization: the duration of a time step [s]
+    :param horizon: the duration of the planning horizon [s]
+    :return: the FiniteMDP, whose current state is the ego-spacecraft state
+    """
+    ego = env.spacecraft
+    headings_count = int(round(2 * np.pi / ego.DELTA_HEADING))
+    time_count = int(horizon / time_quantization)
+    shape = (headings_count, ego.SPEED_COUNT, time_count)
+
+    grid = collision_grid(env, shape, time_quantization)
+    speeds = np.arange(ego.SPEED_COUNT) / max(ego.SPEED_COUNT - 1, 1)
+    state_reward = env.config["collision_reward"] * grid + env.HIGH_VELOCITY_REWARD * speeds[None, :, None]
+    state_reward = utils.remap(state_reward, [env.config["collision_reward"], env.HIGH_VELOCITY_REWARD], [0, 1])
+
+    actions = tuple(env.ACTIONS[a] for a in range(len(env.ACTIONS)))
+    transition = transition_table(shape, actions)
+    terminal = np.ravel(grid | (np.arange(time_count) == time_count - 1)[None, None, :])
+    reward = np.ravel(state_reward)[transition]
+    state = np.ravel_multi_index((0, ego.velocity_index, 0), shape)
+    return FiniteMDP(transition, reward, terminal, state=state, shape=shape)
+
+
+def collision_grid(env, shape, time_quantization):
+    """
+        Find the discretized ego-spacecraft states that collide with other spacecrafts.
+
+    :param env: an environment
+    :param shape: the grid shape (headings, speeds, times)
+    :param time_quantization: the duration of a time step [s]
+    :return: a boolean array of the given shape
+    """
+    ego, fleet = env.spacecraft, env.space.fleet
+    fleet.sync()
+    others = np.arange(fleet.count)
+    others = others[(others != ego.index) & fleet.collisions_enabled[others]]
+    headings_count, speeds_count, time_count = shape
+    if not len(others):
+        return np.zeros(shape, dtype=bool)
+
+    headings = ego.target_heading + ego.DELTA_HEADING * np.arange(headings_count)
+    velocities = ego.index_to_speed(np.arange(speeds_count))[None, :, None] * \
+        np.stack((np.cos(headings), np.sin(headings)), axis=-1)[:, None, :]  # (H, V, 2)
+
+    # Relative trajectories p + w t of the others, for every ego (heading, speed)
+    p = fleet.position[others] - ego.position  # (N, 2)
+    w = fleet.velocities(others)[None, None, :, :] - velocities[:, :, None, :]  # (H, V, N, 2)
+    starts = np.arange(time_count) * time_quantization
+    _, distance = utils.closest_approach(p[None, None, :, None, :], w[:, :, :, None, :],
+                                         starts, starts + time_quantization)  # (H, V, N, T)
+    radius = (ego.LENGTH + fleet.length[others]) / 2
+    return (distance < radius[None, None, :, None]).any(axis=2)
+
+
+@lru_cache(maxsize=32)
+def transition_table(shape, actions):
+    """
+        Compute the next state of every (state, action) pair.
+
+        LEFT and RIGHT turn the target heading by one bin, FASTER and SLOWER change the speed index within its range,
+        and the time always moves forward until the last step.
+
+    :param shape: the grid shape (headings, speeds, times)
+    :param actions: the names of the actions
+    :return: a read-only array of next state indexes, of shape (S, A)
+    """
+    headings_count, speeds_count, time_count = shape
+    h, v, t = (index.ravel() for index in np.indices(shape))
+    next_time = np.minimum(t + 1, time_count - 1)
+    turns = {"LEFT": -1, "RIGHT": 1}
+    accelerations = {"FASTER": 1, "SLOWER": -1}
+    transition = np.stack([np.ravel_multi_index(((h + turns.get(action, 0)) % headings_count,
+                                                 np.clip(v + accelerations.get(action, 0), 0, speeds_count - 1),
+                                                 next_time), shape)
+                           for action in actions], axis=1)
+    transition.flags.writeable = False
+    return transition
@@ -6,8 +6,9 @@ import numpy as np
 import pygame
 from gym.spaces import Discrete
 
-from space_env.space.graphics import SpaceSurface
-from space_env.spacecraft.graphics import SpacecraftGraphics
+from space_env.envs.common.recorder import FrameRecorder
+from space_env.space.graphics import SpaceSurface, SpaceGraphics
+from space_env.spacecraft.graphics import VehicleGraphics
 
 
 class EnvViewer(object):
@@ -15,6 +16,8 @@ class EnvViewer(object):
         A viewer to render a highway driving environment.
     """
     SAVE_IMAGES = False
+    SAVE_PATH = "space-env.npz"
+    REUSE_IMAGE_BUFFER = False
 
     def __init__(self, env, offscreen=False):
         self.env = env
@@ -42,6 +45,8 @@ class EnvViewer(object):
         self.agent_surface = None
         self.spacecraft_trajectory = None
         self.frame = 0
+        self.image = None
+        self.recorder = None
 
     def set_agent_display(self, agent_display):
         """
@@ -82,7 +87,7 @@ class EnvViewer(object):
                 self.env.close()
             self.sim_surface.handle_event(event)
             if self.env.spacecraft:
-                SpacecraftGraphics.handle_event(self.env.spacecraft, event)
+                VehicleGraphics.handle_event(self.env.spacecraft, event)
 
     def display(self):
         """
@@ -92,20 +97,18 @@ class EnvViewer(object):
             return
 
         self.sim_surface.move_display_window_to(self.window_position())
-        RoadGraphics.display(self.env.space, self.sim_surface)
+        SpaceGraphics.display(self.env.space, self.sim_surface)
 
-        if self.vehicle_trajectory:
-            SpacecraftGraphics.display_trajectory(
+        if self.spacecraft_trajectory:
+            VehicleGraphics.display_trajectory(
                 self.spacecraft_trajectory,
                 self.sim_surface,
                 offscreen=self.offscreen)
-        """
-        RoadGraphics.display_traffic(
+        SpaceGraphics.display_traffic(
             self.env.space,
             self.sim_surface,
             simulation_frequency=self.env.SIMULATION_FREQUENCY,
             offscreen=self.offscreen)
-        """
 
         if self.agent_display:
             self.agent_display(self.agent_surface, self.sim_surface)
@@ -119,16 +122,75 @@ class EnvViewer(object):
             self.clock.tick(self.env.SIMULATION_FREQUENCY)
             pygame.display.flip()
 
-        if self.SAVE_IMAGES:
-            pygame.image.save(self.screen, "space-env_{}.png".format(self.frame))
+        if self.SAVE_IMAGES and self.recorder is None:
+            self.start_recording(self.SAVE_PATH)
+        if self.recorder is not None:
+            self.recorder.record(self.get_image(self.recorder.buffer()))
             self.frame += 1
 
-    def get_image(self):
+    def start_recording(self, path, fps=None):
+        """
+            Record the displayed frames into a file, encoded in the background, see FrameRecorder.
+
+        :param path: the path of the recorded file, a .npz archive or a video
+        :param fps: the frame rate of videos, the rate of rendered substeps by default [Hz]
+        :raise RuntimeError: if the viewer is disabled by the dummy SDL video driver, as nothing would be drawn
+        """
+        if not self.enabled:
+            raise RuntimeError("Cannot record a disabled viewer, use the offscreen SDL video driver instead of dummy")
+        self.stop_recording()
+        if fps is None:
+            fps = self.env.SIMULATION_FREQUENCY / self.env.config.get("render_substeps", 1)
+        self.recorder = FrameRecorder(path, self.image_shape(), fps=fps)
+
+    def stop_recording(self):
+        """
+            Wait for the recorded frames to be encoded, and close the recorded file.
+        """
+        if self.recorder is not None:
+            recorder, self.recorder = self.recorder, None
+            recorder.close()
+
+    def get_image(self, out=None):
         """
+            Copy the rendered image into a C-contiguous rgb array.
+
+            The pixels are read through a pixels3d view of the surface, and written in a single copy. If
+            REUSE_IMAGE_BUFFER is set, the same buffer owned by the viewer is returned at each call, and is overwritten
+            by the next one.
+
+        :param out: an array of shape (height, width, 3) and dtype uint8 to write the image into, if any
         :return: the rendered image as a rbg array
         """
-        data = pygame.surfarray.array3d(self.sim_surface)
-        return np.moveaxis(data, 0, 1)
+        if out is None and self.REUSE_IMAGE_BUFFER:
+            if self.image is None:
+                self.image = np.empty(self.image_shape(), dtype=np.uint8)
+            out = self.image
+        if out is None:
+            out = np.empty(self.image_shape(), dtype=np.uint8)
+        pixels = pygame.surfarray.pixels3d(self.sim_surface)
+        np.copyto(out, pixels.transpose(1, 0, 2))
+        del pixels  # Unlock the surface
+        return out
+
+    def get_image_view(self):
+        """
+            A read-only view of the rendered image, without any copy.
+
+            The view is not C-contiguous, since the surface pixels are padded to 4 bytes, and it locks the surface
+            until it is deleted.
+
+        :return: the rendered image as a rgb array view, of shape (height, width, 3)
+        """
+        view = pygame.surfarray.pixels3d(self.sim_surface).transpose(1, 0, 2)
+        view.flags.writeable = False
+        return view
+
+    def image_shape(self):
+        """
+        :return: the shape (height, width, 3) of the rendered images
+        """
+        return self.sim_surface.get_height(), self.sim_surface.get_width(), 3
 
     def window_position(self):
         """
@@ -141,6 +203,7 @@ class EnvViewer(object):
 
     def close(self):
         """
-            Close the pygame window.
+            Close the pygame window, and the recorded file if any.
         """
+        self.stop_recording()
         pygame.quit()
\ No newline at end of file
@@ -0,0 +1,233 @@
+import copy
+
+import numpy as np
+from gym import spaces
+
+from space_env import utils
+
+from space_env.spacecraft.control import MDPSpacecraft
+from space_env.spacecraft.dynamics import Spacecraft
+
+
+class ObservationType(object):
+    def space(self):
+        raise NotImplementedError()
+
+    def observe(self, spacecraft=None):
+        """
+        :param spacecraft: the observing spacecraft, the ego-spacecraft by default
+        :return: the observation
+        """
+        raise NotImplementedError()
+
+    def clone(self, env):
+        """
+            Copy the observation for a cloned environment, with its own output buffer.
+
+        :param env: the environment to observe
+        :return: the copied observation
+        """
+        observation = copy.copy(self)
+        observation.env = env
+        if getattr(self, "buffer", None) is not None:
+            observation.buffer = self.buffer.copy()
+        return observation
+
+
+class KinematicObservation(ObservationType):
+    """
+        Observe the kinematics of the ego-spacecraft and of its closest spacecrafts.
+
+        The first row describes the ego-spacecraft, the next rows its closest spacecrafts sorted by distance, and the
+        missing rows are filled with zeros (and a null presence feature).
+
+        The features of all the rows are computed at once from the fleet columns, and written into an output buffer
+        allocated once. The buffer itself is returned when copy is disabled, and then overwritten by the next
+        observation.
+    """
+    FEATURES = ['presence', 'x', 'y', 'vx', 'vy']
+
+    def __init__(self, env, features=FEATURES, spacecrafts_count=5, features_range=None, normalize=True,
+                 absolute=False, copy=True, **kwargs):
+        """
+        :param env: The environment to observe
+        :param features: Names of features used in the observation
+        :param spacecrafts_count: Number of observed spacecrafts, including the ego-spacecraft
+        :param features_range: a dict mapping a feature name to [min, max] values
+        :param normalize: Should the observation be normalized in [-1, 1]
+        :param absolute: Use absolute coordinates, rather than relative to the ego-spacecraft
+        :param copy: Return a copy of the output buffer, rather than the buffer itself
+        """
+        self.env = env
+        self.features = features
+        self.spacecrafts_count = spacecrafts_count
+        self.features_range = features_range or {
+            "x": [-5.0 * Spacecraft.MAX_VELOCITY, 5.0 * Spacecraft.MAX_VELOCITY],
+            "y": [-5.0 * Spacecraft.MAX_VELOCITY, 5.0 * Spacecraft.MAX_VELOCITY],
+            "vx": [-2 * Spacecraft.MAX_VELOCITY, 2 * Spacecraft.MAX_VELOCITY],
+            "vy": [-2 * Spacecraft.MAX_VELOCITY, 2 * Spacecraft.MAX_VELOCITY]
+        }
+        self.normalize = normalize
+        self.absolute = absolute
+        self.copy = copy
+        self.buffer = np.zeros((self.spacecrafts_count, len(self.features)))
+        self.relative = np.isin(self.features, ["x", "y", "vx", "vy"])
+        self.normalized = np.isin(self.features, list(self.features_range))
+        ranges = np.array([self.features_range[feature] for feature in self.features if feature in self.features_range])
+        self.low = ranges[:, 0] if len(ranges) else np.zeros(0)
+        self.scale = 2 / (ranges[:, 1] - ranges[:, 0]) if len(ranges) else np.zeros(0)
+
+    def space(self):
+        return spaces.Box(shape=(self.spacecrafts_count, len(self.features)), low=-1, high=1, dtype=np.float32)
+
+    def features_of(self, fleet, rows):
+        """
+            Compute the features of spacecrafts.
+
+        :param fleet: the fleet of the spacecrafts
+        :param rows: the rows of the spacecrafts in the fleet
+        :return: the features values, of shape (len(rows), len(features))
+        """
+        heading, velocity, position = fleet.heading[rows], fleet.velocity[rows], fleet.position[rows]
+        values = {
+            "presence": lambda: 1,
+            "x": lambda: position[:, 0],
+            "y": lambda: position[:, 1],
+            "vx": lambda: velocity * np.cos(heading),
+            "vy": lambda: velocity * np.sin(heading),
+            "cos_h": lambda: np.cos(heading),
+            "sin_h": lambda: np.sin(heading)
+        }
+        features = np.empty((len(rows), len(self.features)))
+        for j, feature in enumerate(self.features):
+            features[:, j] = values[feature]()
+        return features
+
+    def observe(self, spacecraft=None):
+        ego = spacecraft or self.env.spacecraft
+        others = self.env.space.spatial_index.query_nearest(ego.position, self.spacecrafts_count - 1,
+                                                            exclude=ego.index)
+        rows = len(others) + 1
+
+        obs = self.buffer
+        obs[:rows] = self.features_of(self.env.space.fleet, np.concatenate(([ego.index], others)))
+        obs[rows:] = 0
+        if not self.absolute:
+            obs[1:rows, self.relative] -= obs[0, self.relative]
+        if self.normalize:
+            obs[:rows, self.normalized] = np.clip((obs[:rows, self.normalized] - self.low) * self.scale - 1, -1, 1)
+        return obs.copy() if self.copy else obs
+
+
+class TimeToCollisionObservation(ObservationType):
+    """
+        Observe the predicted conflicts of the ego-spacecraft with the other spacecrafts, for each of its decisions.
+
+        For each alternative target heading (turning left, keeping its heading or turning right) and target speed of
+        the ego-spacecraft, all spacecrafts are extrapolated at constant velocity and heading, and the closest point
+        of approach of each of them is found in closed form. The observation is a grid of shape
+        (3, speeds, horizon * policy_frequency), whose time bins are filled with 1 at the time to collision with a
+        spacecraft, and with a proximity in [0, 1) decreasing with the miss distance at the time of its closest
+        approach otherwise.
+    """
+
+    def __init__(self, env, horizon=10, miss_range=None, copy=True, **kwargs):
+        """
+        :param env: The environment to observe
+        :param horizon: The prediction horizon [s]
+        :param miss_range: The miss distance beyond which an approach is ignored [m], 5 spacecraft lengths by default
+        :param copy: Return a copy of the output buffer, rather than the buffer itself
+        """
+        self.env = env
+        self.horizon = horizon
+        self.miss_range = miss_range or 5 * Spacecraft.LENGTH
+        self.copy = copy
+        self.buffer = None
+
+    def space(self):
+        return spaces.Box(shape=self.shape(), low=0, high=1, dtype=np.float32)
+
+    def shape(self):
+        return 3, MDPSpacecraft.SPEED_COUNT, int(self.horizon * self.env.config["policy_frequency"])
+
+    def observe(self, spacecraft=None):
+        ego, fleet = spacecraft or self.env.spacecraft, self.env.space.fleet
+        fleet.sync()
+        if self.buffer is None or self.buffer.shape != self.shape():
+            self.buffer = np.zeros(self.shape())
+        grid = self.buffer
+        grid[:] = 0
+        others = np.arange(fleet.count)
+        others = others[(others != ego.index) & fleet.collisions_enabled[others]]
+        if not len(others):
+            return grid.copy() if self.copy else grid
+
+        headings = ego.target_heading + ego.DELTA_HEADING * np.array([-1, 0, 1])
+        speeds = ego.index_to_speed(np.arange(grid.shape[1]))
+        velocities = speeds[None, :, None] * np.stack((np.cos(headings), np.sin(headings)), axis=-1)[:, None, :]
+        position = fleet.position[others] - ego.position  # (N, 2)
+        velocity = fleet.velocities(others)[None, None] - velocities[:, :, None]  # (3, S, N, 2)
+        radius = (ego.LENGTH + fleet.length[others]) / 2
+        ttc = utils.time_to_collision(position, velocity, radius)
+        t, distance = utils.closest_approach(position, velocity)
+
+        # Quantize the times into the grid bins, and the miss distances into proximities
+        frequency = self.env.config["policy_frequency"]
+        collision = ttc < self.horizon
+        time = np.where(collision, ttc, t)
+        value = np.where(collision, 1, np.clip(1 - (distance - radius) / self.miss_range, 0, 1 - 1e-3))
+        bins = np.minimum((time * frequency).astype(int), grid.shape[2] - 1)
+        valid = (time < self.horizon) & (value > 0)
+        h, s, _ = np.nonzero(valid)
+        np.maximum.at(grid, (h, s, bins[valid]), value[valid])
+        return grid.copy() if self.copy else grid
+
+
+class MultiAgentObservation(ObservationType):
+    """
+        Observe the space from each of the controlled spacecrafts of a multi-agent environment.
+
+        The observations of the agents are stacked along a first axis, in the order of env.controlled_spacecrafts.
+    """
+
+    def __init__(self, env, observation_config, copy=True, **kwargs):
+        """
+        :param env: The environment to observe
+        :param observation_config: the configuration of the observation of each agent
+        :param copy: Return a copy of the output buffer, rather than the buffer itself
+        """
+        self.env = env
+        self.agent_observation = observation_factory(env, dict(observation_config, copy=False))
+        self.copy = copy
+        self.buffer = None
+
+    def clone(self, env):
+        observation = super(MultiAgentObservation, self).clone(env)
+        observation.agent_observation = self.agent_observation.clone(env)
+        return observation
+
+    def space(self):
+        agent_space = self.agent_observation.space()
+        count = len(self.env.controlled_spacecrafts) or self.env.config["controlled_spacecrafts"]
+        return spaces.Box(shape=(count,) + agent_space.shape, low=agent_space.low.min(), high=agent_space.high.max(),
+                          dtype=agent_space.dtype)
+
+    def observe(self, spacecraft=None):
+        agents = self.env.controlled_spacecrafts
+        for k, agent in enumerate(agents):
+            obs = self.agent_observation.observe(agent)
+            if self.buffer is None or self.buffer.shape != (len(agents),) + obs.shape:
+                self.buffer = np.zeros((len(agents),) + obs.shape)
+            self.buffer[k] = obs
+        return self.buffer.copy() if self.copy else self.buffer
+
+
+def observation_factory(env, config):
+    if config["type"] == "Kinematics":
+        return KinematicObservation(env, **config)
+    elif config["type"] == "TimeToCollision":
+        return TimeToCollisionObservation(env, **config)
+    elif config["type"] == "MultiAgent":
+        return MultiAgentObservation(env, **config)
+    else:
+        raise ValueError("Unknown observation type")
@@ -0,0 +1,121 @@
+import queue
+import threading
+import zipfile
+
+import numpy as np
+
+
+class FrameRecorder(object):
+    """
+        Record rendered frames into a single file, encoded by a background thread.
+
+        The frames are copied into a fixed pool of preallocated buffers, and handed to the encoding thread through a
+        bounded queue: the simulation only waits for the encoder when all the buffers are in use. Files ending with
+        .npz are written as a compressed numpy archive, with one "frame_<k>" array per frame, streamed so that the
+        frames are never all held in memory. Other files are encoded as videos with imageio, which must be installed.
+    """
+
+    QUEUE_SIZE = 32
+
+    def __init__(self, path, shape, fps=15, queue_size=QUEUE_SIZE):
+        """
+        :param path: the path of the recorded file
+        :param shape: the shape (height, width, 3) of the frames
+        :param fps: the frame rate of videos [Hz]
+        :param queue_size: the number of frame buffers
+        """
+        self.path = path
+        self.shape = tuple(shape)
+        self.fps = fps
+        self.frames_count = 0
+        self.error = None
+        if not path.endswith(".npz"):
+            try:
+                import imageio  # noqa
+            except ImportError as e:
+                raise ImportError("Recording videos requires imageio, record to a .npz archive instead") from e
+        self._free = queue.Queue()
+        for _ in range(queue_size):
+            self._free.put(np.empty(self.shape, dtype=np.uint8))
+        self._frames = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._encode, name="FrameRecorder", daemon=True)
+        self._thread.start()
+
+    def buffer(self):
+        """
+            Get a free frame buffer, waiting for the encoder if all of them are in use.
+
+        :return: an array of the frame shape and dtype uint8
+        """
+        self._check()
+        return self._free.get()
+
+    def record(self, frame):
+        """
+            Queue a frame for encoding.
+
+        :param frame: a frame buffer obtained from buffer(), which must not be used after this call
+        """
+        self._check()
+        self._frames.put(frame)
+        self.frames_count += 1
+
+    def close(self):
+        """
+            Wait for the queued frames to be encoded, and close the file.
+        """
+        if self._thread is not None:
+            self._frames.put(None)
+            self._thread.join()
+            self._thread = None
+        self._check()
+
+    def _check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("The recording of {} failed".format(self.path)) from error
+
+    def _encode(self):
+        writer = None
+        try:
+            writer = self._open()
+            while True:
+                frame = self._frames.get()
+                if frame is None:
+                    break
+                writer.append_data(frame)
+                self._free.put(frame)
+        except Exception as e:
+            self.error = e
+            # Keep releasing the buffers, so that the simulation is never blocked
+            frame = self._frames.get()
+            while frame is not None:
+                self._free.put(frame)
+                frame = self._frames.get()
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _open(self):
+        if self.path.endswith(".npz"):
+            return _ArchiveWriter(self.path)
+        import imageio
+        return imageio.get_writer(self.path, fps=self.fps)
+
+
+class _ArchiveWriter(object):
+    """
+        Stream arrays into a compressed .npz archive, readable with numpy.load().
+    """
+
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(path, mode="w", compression=zipfile.ZIP_DEFLATED)
+        self.count = 0
+
+    def append_data(self, frame):
+        with self.archive.open("frame_{}.npy".format(self.count), mode="w", force_zip64=True) as f:
+            np.lib.format.write_array(f, frame, allow_pickle=False)
+        self.count += 1
+
+    def close(self):
+        self.archive.close()
@@ -1,8 +1,11 @@
+import numpy as np
 from gym.envs.registration import register
 
 from space_env import utils
 from space_env.envs.common.abstract import AbstractEnv
-#from space_env.spacecraft.control import MDPSpacecraft
+from space_env.space.scenario import separated_positions
+from space_env.space.space import Space
+from space_env.spacecraft.control import MDPSpacecraft
 
 class SpaceEnv(AbstractEnv):
     """
@@ -15,7 +18,8 @@ class SpaceEnv(AbstractEnv):
     HIGH_VELOCITY_REWARD = 1
     REACH_GOAL_REWARD = 1
 
-    def default_config(self):
+    @classmethod
+    def default_config(cls):
         config = super().default_config()
         config.update({
             "observation":{
@@ -23,7 +27,9 @@ class SpaceEnv(AbstractEnv):
             },
             "duration": 40,
             "spacecrafts_count": 2,
-            "collision_reward": self.COLLISION_REWARD
+            "spawn_radius": None,  # [m], 200 m enlarged to the number of spacecrafts by default
+            "min_separation": 2 * MDPSpacecraft.LENGTH,  # [m]
+            "collision_reward": cls.COLLISION_REWARD
         }) 
         return config 
 
@@ -33,49 +39,81 @@ class SpaceEnv(AbstractEnv):
         self.steps = 0
         return super(SpaceEnv, self).reset()
 
-    def step(self, action):
-        self.steps += 1
-        return super(SpaceEnv, self).step(action)
-
     def _create_space(self):
         """
-            Create a space
+            Create a space, closing the log of the previous one
         """
+        if self.space is not None:
+            self.space.close()
+        self.space = Space(np_random=self.np_random,
+                           record_history=self.config["show_trajectories"],
+                           log_path=self.config["log_path"],
+                           integrator=self.config["integrator"],
+                           continuous_collisions=self.config["continuous_collisions"])
 
     def _create_spacecrafts(self):
         """
             Create some random vehicles of a given type and add them in space
+
+            The first controlled spacecraft is the ego-spacecraft. The states of all the spacecrafts are sampled at
+            once, at least min_separation apart in a disc of radius spawn_radius, and written directly into the fleet
+            of the space. The default radius keeps the disc a quarter full at most.
         """
-        self.spacecraft = MPDSpacecraft.create_random(self.space, )
-        self.space.spacecrafts.append(self.spacecraft)
+        controlled = self.config["controlled_spacecrafts"]
+        count = controlled + self.config["spacecrafts_count"]
+        separation = self.config["min_separation"]
+        radius = self.config["spawn_radius"] or max(200, separation * np.sqrt(count))
+        positions = separated_positions(self.np_random, count, radius, separation)
 
-        vehicles_type = utils.class_from_path(self.config["other_spacecrafts_type"])
-        for _ in range(self.config["spacecrafts_count"]):
-            self.road.spacecrafts.append(spacecrafts_type.create_random(self.space))
+        self.controlled_spacecrafts = MDPSpacecraft.create_random_many(self.space, positions[:controlled])
+        self.spacecraft = self.controlled_spacecrafts[0]
+        spacecrafts_type = utils.class_from_path(self.config["other_spacecrafts_type"])
+        spacecrafts_type.create_random_many(self.space, positions[controlled:])
 
     def _reward(self, action):
         """
             The reward is defined to foster the flying at high speed 
             :param action: the last action performed
-            :retur: the corresponding reward
+            :return: the corresponding reward
+        """
+        return self._state_rewards(self.spacecraft.crashed, self.spacecraft.velocity_index)
+
+    def _agent_rewards(self, actions):
+        rows = self._agent_rows()
+        fleet = self.space.fleet
+        return self._state_rewards(fleet.crashed[rows], MDPSpacecraft.speed_to_index(fleet.target_velocity[rows]))
+
+    def _state_rewards(self, crashed, velocity_index):
+        """
+        :param crashed: whether the spacecrafts crashed, a scalar or an array
+        :param velocity_index: the indexes of their target velocities, a scalar or an array
+        :return: the corresponding rewards, in [0, 1]
         """
-        action_reward = {0: 0}
-        state_reward = self.config["collision_reward"] * self.spacecraft.crashed +\
-                       self.COLLISION_REWARD
-        return utils.remap()
+        state_reward = self.config["collision_reward"] * crashed + \
+            self.HIGH_VELOCITY_REWARD * velocity_index / max(MDPSpacecraft.SPEED_COUNT - 1, 1)
+        return utils.remap(state_reward, [self.config["collision_reward"], self.HIGH_VELOCITY_REWARD], [0, 1])
 
     def _is_terminal(self):
         """
-            The episode is over if the ego spacecraft crashed or the time is out.
+            The episode is over if the ego spacecraft crashed or the time is out, or in multi-agent mode when all
+            the controlled spacecrafts are terminal.
         """
+        if self.config["multi_agent"]:
+            return bool(self._agent_dones().all())
         return self.spacecraft.crashed or self.steps >= self.config["duration"]
 
+    def _agent_dones(self):
+        return self.space.fleet.crashed[self._agent_rows()] | (self.steps >= self.config["duration"])
+
     def _cost(self, action):
         """
             The cost signal is the occurrence of collision
         """
         return float(self.spacecraft.crashed)
 
+    def _agent_costs(self, actions):
+        return self.space.fleet.crashed[self._agent_rows()].astype(float)
+
 register(
     id='space-v0',
     entry_point='space_env.envs:SpaceEnv',
@@ -0,0 +1,190 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from space_env.envs.space_env import SpaceEnv
+from space_env.envs.vec_env import SpaceVecEnv
+
+
+class SubprocVecEnv(object):
+    """
+        A batch of SpaceEnv worlds spread across worker processes.
+
+        Each worker hosts a SpaceVecEnv of several worlds. The observations, rewards and terminal flags are written by
+        the workers straight into a block of shared memory, so that the parent reads them without any pickling: only
+        the actions and the info dicts go through the pipes. Steps and resets are asynchronous, so that the parent can
+        work while the workers simulate.
+    """
+
+    def __init__(self, num_envs, config=None, num_workers=None, env_class=SpaceEnv, start_method=None):
+        """
+        :param num_envs: the number K of worlds
+        :param config: the configuration of the worlds
+        :param num_workers: the number of worker processes, one per CPU core by default
+        :param env_class: the class of the worlds, SpaceEnv by default
+        :param start_method: the multiprocessing start method, see multiprocessing.get_context()
+        """
+        self.num_envs = num_envs
+        self.num_workers = min(num_workers or multiprocessing.cpu_count(), num_envs)
+        env = env_class(config)
+        SpaceVecEnv.check_config(env.config)
+        self.action_space = env.action_space
+        self.observation_space = env.observation_space
+        env.close()
+
+        self.layout = self._layout(num_envs, self.observation_space)
+        self.shm = shared_memory.SharedMemory(create=True, size=sum(nbytes for _, _, _, nbytes in self.layout.values()))
+        self.observations, self.rewards, self.terminals = _buffers(self.shm, self.layout)
+
+        bounds = [int(bound) for bound in np.linspace(0, num_envs, self.num_workers + 1)]
+        self.slices = [slice(start, end) for start, end in zip(bounds[:-1], bounds[1:])]
+        context = multiprocessing.get_context(start_method)
+        self.remotes, self.processes = [], []
+        for worker_slice in self.slices:
+            remote, worker_remote = context.Pipe()
+            process = context.Process(target=_worker,
+                                      args=(worker_remote, remote, self.shm.name, self.layout, worker_slice,
+                                            config, env_class),
+                                      daemon=True)
+            process.start()
+            worker_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+        self.waiting = False
+        self.closed = False
+
+    @staticmethod
+    def _layout(num_envs, observation_space):
+        """
+            Describe the arrays stored in shared memory.
+
+        :return: a dict mapping each array name to its (offset, shape, dtype, size in bytes)
+        """
+        layout, offset = {}, 0
+        for name, shape, dtype in [("observations", (num_envs,) + observation_space.shape, np.float64),
+                                   ("rewards", (num_envs,), np.float64),
+                                   ("terminals", (num_envs,), np.bool_)]:
+            nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            layout[name] = (offset, shape, np.dtype(dtype).str, nbytes)
+            offset += nbytes
+        return layout
+
+    def seed(self, seed=None):
+        """
+            Seed the worlds with consecutive seeds.
+
+        :param seed: the seed of the first world
+        :return: the list of seeds
+        """
+        for remote, worker_slice in zip(self.remotes, self.slices):
+            remote.send(("seed", None if seed is None else seed + worker_slice.start))
+        return [s for remote in self.remotes for s in remote.recv()]
+
+    def reset_async(self):
+        for remote in self.remotes:
+            remote.send(("reset", None))
+        self.waiting = True
+
+    def reset_wait(self, copy=True):
+        """
+        :param copy: whether to return a copy of the observations, rather than the shared buffer itself
+        :return: the stacked observations, of shape (K, ...)
+        """
+        for remote in self.remotes:
+            remote.recv()
+        self.waiting = False
+        return self.observations.copy() if copy else self.observations
+
+    def reset(self):
+        self.reset_async()
+        return self.reset_wait()
+
+    def step_async(self, actions):
+        """
+            Send the actions to the workers, without waiting for the results.
+
+        :param actions: the actions of the ego-spacecrafts, of shape (K,)
+        """
+        actions = np.asarray(actions)
+        for remote, worker_slice in zip(self.remotes, self.slices):
+            remote.send(("step", actions[worker_slice]))
+        self.waiting = True
+
+    def step_wait(self, copy=True):
+        """
+            Wait for the workers to finish their step.
+
+            The buffers are only valid until the next call to step_async() or reset_async(), unless copied.
+
+        :param copy: whether to return copies of the buffers, rather than the shared buffers themselves
+        :return: a tuple (observations, rewards, terminals, infos), stacked along the first axis
+        """
+        infos = [info for remote in self.remotes for info in remote.recv()]
+        self.waiting = False
+        if copy:
+            return self.observations.copy(), self.rewards.copy(), self.terminals.copy(), infos
+        return self.observations, self.rewards, self.terminals, infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        for remote in self.remotes:
+            try:
+                if self.waiting:
+                    remote.recv()
+                remote.send(("close", None))
+            except (BrokenPipeError, EOFError):
+                pass
+        for process in self.processes:
+            process.join()
+        self.observations = self.rewards = self.terminals = None
+        self.shm.close()
+        self.shm.unlink()
+        self.closed = True
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            self.close()
+
+
+def _buffers(shm, layout):
+    """
+        Map the arrays described by a layout on a block of shared memory.
+    """
+    return [np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            for offset, shape, dtype, _ in layout.values()]
+
+
+def _worker(remote, parent_remote, shm_name, layout, worker_slice, config, env_class):
+    """
+        Host a SpaceVecEnv for a slice of the worlds, and write its outputs in shared memory.
+    """
+    parent_remote.close()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    observations, rewards, terminals = (buffer[worker_slice] for buffer in _buffers(shm, layout))
+    envs = SpaceVecEnv(worker_slice.stop - worker_slice.start, config, env_class)
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == "step":
+                observations[:], rewards[:], terminals[:], infos = envs.step(data)
+                remote.send(infos)
+            elif command == "reset":
+                observations[:] = envs.reset()
+                remote.send(None)
+            elif command == "seed":
+                remote.send(envs.seed(data))
+            elif command == "close":
+                break
+            else:
+                raise NotImplementedError(command)
+    finally:
+        envs.close()
+        del observations, rewards, terminals
+        shm.close()
+        remote.close()
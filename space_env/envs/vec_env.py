@@ -0,0 +1,176 @@
+import numpy as np
+
+from space_env.envs.space_env import SpaceEnv
+from space_env.space.fleet import Fleet
+
+
+class SpaceVecEnv(object):
+    """
+        A batch of independent SpaceEnv worlds, stepped together in a single process.
+
+        The spacecrafts of all worlds are stored in one batched Fleet: each world owns a block of rows, through a
+        fleet view, so that the kinematics and collisions of every world are processed by single array updates.
+        The rewards, terminal conditions, costs and observations are those of the SpaceEnv worlds, which are reset
+        automatically when their episode ends.
+    """
+
+    def __init__(self, num_envs, config=None, env_class=SpaceEnv):
+        """
+        :param num_envs: the number K of worlds
+        :param config: the configuration of the worlds
+        :param env_class: the class of the worlds, SpaceEnv by default
+        """
+        self.envs = [env_class(config) for _ in range(num_envs)]
+        self.check_config(self.envs[0].config)
+        self.num_envs = num_envs
+        self.action_space = self.envs[0].action_space
+        self.observation_space = self.envs[0].observation_space
+        self.broad_phase = self.envs[0].space.broad_phase
+        self.continuous_collisions = self.envs[0].space.continuous_collisions
+        self.fleet = None
+        self.worlds = None
+        self.capacity = 0
+
+    @staticmethod
+    def check_config(config):
+        """
+            Check that the worlds of a configuration can be stepped together.
+
+        :param config: the configuration of a world
+        :raise ValueError: if the configuration has options that SpaceVecEnv does not support
+        """
+        if config.get("multi_agent"):
+            raise ValueError("The worlds of a SpaceVecEnv must be single-agent")
+        if config.get("jit_simulation"):
+            raise ValueError("The worlds of a SpaceVecEnv are not simulated by a compiled simulation")
+        if config.get("profile"):
+            raise ValueError("The worlds of a SpaceVecEnv cannot be profiled")
+        if config.get("render_substeps", 1) != 1:
+            raise ValueError("The intermediate simulation steps of a SpaceVecEnv are not rendered")
+        if config.get("log_path"):
+            raise ValueError("The worlds of a SpaceVecEnv cannot stream their logs to a common file")
+
+    def seed(self, seed=None):
+        """
+            Seed the worlds with consecutive seeds.
+
+        :param seed: the seed of the first world
+        :return: the list of seeds
+        """
+        return [env.seed(None if seed is None else seed + k)[0] for k, env in enumerate(self.envs)]
+
+    def reset(self):
+        """
+            Reset all the worlds.
+
+        :return: the stacked observations, of shape (K, ...)
+        """
+        observations = [env.reset() for env in self.envs]
+        self._pack()
+        return np.stack(observations)
+
+    def step(self, actions):
+        """
+            Perform an action in every world and step their dynamics together.
+
+            The worlds whose episode has ended are reset, and the last observation of their episode is stored in
+            their info dict as "terminal_observation".
+
+        :param actions: the actions of the ego-spacecrafts, of shape (K,)
+        :return: a tuple (observations, rewards, terminals, infos), stacked along the first axis
+        """
+        for env in self.envs:
+            env.steps += 1
+        self._simulate(actions)
+
+        observations, rewards, terminals, infos = [], [], [], []
+        for k, (env, action) in enumerate(zip(self.envs, actions)):
+            obs = env.observation.observe()
+            reward = env._reward(action)
+            terminal = env._is_terminal()
+            info = env._info(action)
+            if terminal:
+                info["terminal_observation"] = np.array(obs)
+                obs = env.reset()
+                self._attach(k)
+            observations.append(obs)
+            rewards.append(reward)
+            terminals.append(terminal)
+            infos.append(info)
+        return np.stack(observations), np.array(rewards), np.array(terminals), infos
+
+    def render(self, mode='rgb_array', out=None):
+        """
+            Render the images of all worlds.
+
+        :param mode: the rendering mode, only 'rgb_array' is supported
+        :param out: an array of shape (K, height, width, 3) and dtype uint8 to write the images into, if any
+        :return: the images of all worlds, of shape (K, height, width, 3)
+        """
+        if mode != 'rgb_array':
+            raise NotImplementedError("Only the rgb_array rendering mode is supported")
+        if out is None:
+            config = self.envs[0].config
+            out = np.empty((self.num_envs, config["screen_height"], config["screen_width"], 3), dtype=np.uint8)
+        for env, image in zip(self.envs, out):
+            env.render(mode, out=image)
+        return out
+
+    def _simulate(self, actions):
+        """
+            Perform the simulation steps of all worlds with constant actions, as in AbstractEnv._simulate().
+        """
+        running = list(range(self.num_envs))
+        frequency = self.envs[0].SIMULATION_FREQUENCY
+        substeps = int(frequency // self.envs[0].config["policy_frequency"])
+        for k in range(substeps):
+            for i in running:
+                env = self.envs[i]
+                if k == 0 and actions[i] is not None:
+                    env.spacecraft.act(env.ACTIONS[actions[i]])
+                env.space.act()
+            for i in running:
+                if self.envs[i].space.fleet.parent is not self.fleet:
+                    self._attach(i)
+
+            rows = np.concatenate([np.arange(i * self.capacity, i * self.capacity + self.envs[i].space.fleet.count)
+                                   for i in running])
+            poses = (self.fleet.position.copy(), self.fleet.heading.copy()) if self.continuous_collisions else None
+            self.fleet.step(1 / frequency, rows=rows)
+            self.fleet.resolve_collisions(*self.fleet.collision_candidates(self.broad_phase, rows, self.worlds, poses),
+                                          start=poses)
+
+            for i in running:
+                env = self.envs[i]
+                env.space.after_step(1 / frequency)
+                env.time += 1
+            running = [i for i in running if not (self.envs[i].done or self.envs[i]._is_terminal())]
+            if not running:
+                break
+
+    def _pack(self):
+        """
+            Allocate the batched fleet, with blocks large enough for the largest world, and bind all worlds to it.
+        """
+        self.capacity = max(len(env.space.spacecrafts) for env in self.envs)
+        self.fleet = Fleet(self.num_envs * self.capacity, integrator=self.envs[0].space.fleet.integrator)
+        self.worlds = np.arange(self.fleet.capacity) // self.capacity
+        for k in range(self.num_envs):
+            self._attach(k)
+
+    def _attach(self, k):
+        """
+            Bind the spacecrafts of a world to its block of the batched fleet.
+
+        :param k: the world index
+        """
+        space = self.envs[k].space
+        if len(space.spacecrafts) > self.capacity:
+            return self._pack()
+        fleet = self.fleet.view(k * self.capacity, self.capacity)
+        fleet.bind(space.spacecrafts)
+        space.fleet = fleet
+
+    def close(self):
+        for env in self.envs:
+            env.close()
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class Loggable(object):
     """
         Implements an object whose metrics can be logged through
@@ -18,6 +21,103 @@ class Loggable(object):
         raise Exception('Not implemented.')
 
 
+class ColumnarLog(object):
+    """
+        A log of records stored in preallocated numpy columns, which grow by doubling.
+
+        Records are appended in batches, e.g. one row per spacecraft at each dump, so that logging a whole fleet is a
+        single array copy per column. The log is exported as a single pandas DataFrame or Arrow table without any
+        concatenation. For long runs, the records can be streamed to a Parquet file in chunks: only the records not
+        written yet are then kept in memory.
+    """
+
+    INITIAL_CAPACITY = 1024
+    CHUNK_SIZE = 2 ** 16
+
+    def __init__(self, dtypes, path=None, chunk_size=CHUNK_SIZE, capacity=INITIAL_CAPACITY):
+        """
+        :param dtypes: a dict mapping each column name to its numpy dtype
+        :param path: the path of a Parquet file to stream the records to, if any
+        :param chunk_size: the number of records kept in memory before being written to the Parquet file
+        :param capacity: the initial number of rows of the columns
+        """
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in dtypes.items()}
+        self.path = path
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.written = 0
+        self._writer = None
+        self.columns = {name: np.empty(max(int(capacity), 1), dtype=dtype) for name, dtype in self.dtypes.items()}
+
+    def append(self, **values):
+        """
+            Append a batch of records.
+
+        :param values: the values of every column, as arrays of a common length or scalars. A batch of scalars only
+                       is a single record, and a batch of empty arrays is ignored.
+        """
+        sizes = [np.size(value) for value in values.values() if np.ndim(value)]
+        size = max(sizes) if sizes else 1
+        if not size:
+            return
+        if self.count + size > len(next(iter(self.columns.values()))):
+            self._grow(self.count + size)
+        for name, column in self.columns.items():
+            column[self.count:self.count + size] = values[name]
+        self.count += size
+        if self.path and self.count >= self.chunk_size:
+            self.flush()
+
+    def _grow(self, size):
+        capacity = len(next(iter(self.columns.values())))
+        while capacity < size:
+            capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            self.columns[name] = grown
+
+    def __len__(self):
+        return self.written + self.count
+
+    def to_dataframe(self):
+        """
+            Build a pandas DataFrame of the records kept in memory, sharing their columns when possible.
+        """
+        import pandas as pd
+        return pd.DataFrame({name: column[:self.count] for name, column in self.columns.items()}, copy=False)
+
+    def to_arrow(self):
+        """
+            Build a pyarrow Table of the records kept in memory.
+        """
+        import pyarrow as pa
+        return pa.table({name: column[:self.count] for name, column in self.columns.items()})
+
+    def flush(self):
+        """
+            Write the records kept in memory to the Parquet file, and release them.
+        """
+        if not self.path or not self.count:
+            return
+        import pyarrow.parquet as pq
+        table = self.to_arrow()
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+        self.written += self.count
+        self.count = 0
+
+    def close(self):
+        """
+            Write the remaining records and close the Parquet file, if any.
+        """
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
 def test():
     from space_env.spacecraft.dynamics import Spacecraft
     r = None
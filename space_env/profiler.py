@@ -0,0 +1,78 @@
+import time
+from collections import defaultdict
+
+
+class Profiler(object):
+    """
+        Accumulates the time spent in each phase of the simulation, and event counters, with a monotonic clock.
+
+        The measures of the current step are gathered separately, so that they can be reported with the step, and
+        are added to the totals when the step ends. Instrumented code holds an optional profiler and only measures
+        when it is set, so that a disabled profiler costs a single test per phase.
+    """
+
+    def __init__(self):
+        self.steps = 0
+        self.times = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.step_times = defaultdict(float)
+        self.step_counters = defaultdict(int)
+
+    @staticmethod
+    def clock():
+        return time.perf_counter()
+
+    def lap(self, phase, start):
+        """
+            Add the time elapsed since a start time to a phase.
+
+        :param phase: the phase name
+        :param start: the start time, as returned by clock() or lap()
+        :return: the current time, to be used as the start of the next phase
+        """
+        now = time.perf_counter()
+        self.step_times[phase] += now - start
+        return now
+
+    def count(self, name, value=1):
+        """
+            Increment a counter.
+
+        :param name: the counter name
+        :param value: the increment
+        """
+        self.step_counters[name] += value
+
+    def end_step(self):
+        """
+            Add the measures of the current step to the totals, and start a new step.
+
+        :return: the measures of the step, as a dict of phase times [s] and counters
+        """
+        measures = dict(self.step_times)
+        measures.update(self.step_counters)
+        for phase, duration in self.step_times.items():
+            self.times[phase] += duration
+        for name, value in self.step_counters.items():
+            self.counters[name] += value
+        self.steps += 1
+        self.step_times.clear()
+        self.step_counters.clear()
+        return measures
+
+    def stats(self):
+        """
+            Aggregate the measures of all the steps so far.
+
+        :return: a dict with the number of steps, the total and mean time of each phase [s], and the counters totals
+        """
+        steps = max(self.steps, 1)
+        return {
+            "steps": self.steps,
+            "time": dict(self.times),
+            "mean_time": {phase: duration / steps for phase, duration in self.times.items()},
+            "counters": dict(self.counters),
+        }
+
+    def reset(self):
+        self.__init__()
@@ -0,0 +1,117 @@
+import numpy as np
+
+
+class BroadPhase(object):
+    """
+        A broad phase of collision detection.
+
+        It is rebuilt from the spacecrafts positions at every step, and emits the pairs of spacecrafts that are close
+        enough to collide, so that only those are passed to the accurate (narrow phase) collision check.
+    """
+
+    def pairs(self, positions, radius, groups=None):
+        """
+            Find the candidate pairs of points closer than a given distance.
+
+        :param positions: an array of positions, of shape (N, 2)
+        :param radius: the distance under which two points form a candidate pair
+        :param groups: an optional array of integer labels, of shape (N,), such that only points of the same group
+                       are paired. This allows to process several independent spaces at once.
+        :return: two index arrays (i, j) with i < j, each unordered pair appearing once
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _within(positions, i, j, radius, groups=None):
+        """
+            Keep the pairs of a same group closer than a given distance, ordered with i < j.
+        """
+        delta = positions[j] - positions[i]
+        close = np.einsum('ij,ij->i', delta, delta) <= radius ** 2
+        if groups is not None:
+            close &= groups[i] == groups[j]
+        i, j = i[close], j[close]
+        return np.minimum(i, j), np.maximum(i, j)
+
+
+class BruteForce(BroadPhase):
+    """
+        Test all the N(N-1)/2 pairs at once. Fastest for a handful of spacecrafts.
+    """
+
+    def pairs(self, positions, radius, groups=None):
+        i, j = np.triu_indices(len(positions), k=1)
+        return self._within(positions, i, j, radius, groups)
+
+
+class SweepAndPrune(BroadPhase):
+    """
+        Sort the points along the x axis, and only pair points whose x intervals overlap.
+
+        The groups are laid out apart from each other along the x axis, unless all the points are paired.
+    """
+
+    def pairs(self, positions, radius, groups=None):
+        x = positions[:, 0]
+        if groups is not None and len(x) and np.isfinite(radius):
+            x = x + (groups - groups.min()) * (np.ptp(x) + 2 * radius)
+        order = np.argsort(x, kind='stable')
+        x = x[order]
+        ends = np.searchsorted(x, x + radius, side='right')
+        i, j = expand_ranges(np.arange(1, len(x) + 1), ends)
+        return self._within(positions, order[i], order[j], radius, groups)
+
+
+class SpatialHashGrid(BroadPhase):
+    """
+        Hash the points in a uniform grid of cells of the pairing radius, and only pair points of neighbouring cells.
+
+        Each cell is paired with itself and with four of its eight neighbours, so that every pair of neighbouring
+        cells is visited once. The cells of different groups are hashed apart.
+    """
+
+    NEIGHBOURS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+    def __init__(self, cell_size=None):
+        """
+        :param cell_size: the size of the grid cells [m], the pairing radius by default
+        """
+        self.cell_size = cell_size
+
+    def pairs(self, positions, radius, groups=None):
+        if len(positions) < 2:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        cell_size = max(self.cell_size or radius, radius)
+        cells = np.floor(positions / cell_size).astype(np.int64)
+        cells -= cells.min(axis=0) - 1
+        rows = cells[:, 1].max() + 2
+        keys = cells[:, 0] * rows + cells[:, 1]
+        if groups is not None:
+            keys += (groups - groups.min()) * (cells[:, 0].max() + 2) * rows
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        candidates_i, candidates_j = [], []
+        for dx, dy in self.NEIGHBOURS:
+            neighbour_keys = sorted_keys + dx * rows + dy
+            if (dx, dy) == (0, 0):
+                starts = np.arange(1, len(order) + 1)
+            else:
+                starts = np.searchsorted(sorted_keys, neighbour_keys, side='left')
+            ends = np.searchsorted(sorted_keys, neighbour_keys, side='right')
+            i, j = expand_ranges(starts, ends)
+            candidates_i.append(order[i])
+            candidates_j.append(order[j])
+        return self._within(positions, np.concatenate(candidates_i), np.concatenate(candidates_j), radius, groups)
+
+
+def expand_ranges(starts, ends):
+    """
+        Expand, for each row k, the range [starts[k], ends[k]) into pairs (k, l).
+
+    :return: two index arrays (k, l)
+    """
+    counts = np.maximum(ends - starts, 0)
+    k = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return k, np.repeat(starts, counts) + offsets
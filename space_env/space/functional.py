@@ -0,0 +1,212 @@
+"""
+    A pure functional version of the space dynamics, that can be compiled with jax.jit and vectorized with jax.vmap.
+
+    The state of a fleet is held in an immutable SpaceState of arrays, and step(state, actions, dt) reproduces one
+    simulation step of the object-oriented simulation:
+
+    - the high-level actions update the targets of the controlled spacecrafts, as in ControlledSpacecraft.act();
+    - the low-level controllers compute their steering and acceleration commands;
+    - the kinematics are integrated, as in Fleet.step();
+    - colliding spacecrafts are flagged as crashed, as in Space.check_collisions().
+
+    Uncontrolled spacecrafts keep repeating their current commands. Collisions are checked over all pairs, which
+    suits the small fleets of many independent worlds: to step a batch of worlds, stack their states and use
+    jax.vmap(step, in_axes=(0, 0, None)).
+
+    jax computes in single precision unless 64-bit types are enabled: simulate() enables them, so that the compiled
+    simulation of an environment matches its eager one.
+"""
+from collections import namedtuple
+from functools import partial
+
+import jax
+import jax.numpy as np
+import numpy as onp
+from jax import lax
+
+from space_env import utils
+from space_env.space.fleet import Fleet
+from space_env.spacecraft.control import ControlledSpacecraft
+
+# Indexes of the high-level actions, as in AbstractEnv.ACTIONS
+LEFT, IDLE, RIGHT, FASTER, SLOWER = range(5)
+
+
+class SpaceState(namedtuple("SpaceState", Fleet.COLUMNS)):
+    """
+        The state of a fleet, as a tuple of arrays with one row per spacecraft.
+    """
+    __slots__ = ()
+
+
+def from_fleet(fleet):
+    """
+        Gather the state of a fleet.
+
+    :param fleet: a Fleet
+    :return: its SpaceState
+    """
+    return SpaceState(*(onp.array(getattr(fleet, name)[:fleet.count]) for name in Fleet.COLUMNS))
+
+
+def to_fleet(state, fleet):
+    """
+        Write a state back into a fleet of the same size.
+
+    :param state: a SpaceState
+    :param fleet: the Fleet to update
+    """
+    for name, value in zip(SpaceState._fields, state):
+        getattr(fleet, name)[:fleet.count] = value
+
+
+def apply_actions(state, actions):
+    """
+        Update the targets of the controlled spacecrafts given their high-level actions.
+
+    :param state: a SpaceState
+    :param actions: the action index of every spacecraft, of shape (N,)
+    :return: the updated SpaceState
+    """
+    velocity_change = np.where(actions == FASTER, 1, np.where(actions == SLOWER, -1, 0))
+    heading_change = np.where(actions == RIGHT, 1, np.where(actions == LEFT, -1, 0))
+    target_velocity = np.clip(state.target_velocity + velocity_change * state.delta_velocity,
+                              state.min_target_velocity, state.max_target_velocity)
+    target_heading = state.target_heading + heading_change * state.delta_heading
+    return state._replace(target_velocity=np.where(state.controlled, target_velocity, state.target_velocity),
+                          target_heading=np.where(state.controlled, target_heading, state.target_heading))
+
+
+def control(state):
+    """
+        Compute the commands of the velocity and heading controllers of the controlled spacecrafts.
+
+    :param state: a SpaceState
+    :return: the SpaceState with updated steering and acceleration commands
+    """
+    velocity = np.where(np.abs(state.velocity) > utils.EPSILON, state.velocity,
+                        np.where(state.velocity > 0, utils.EPSILON, -utils.EPSILON))
+    heading_rate_command = ControlledSpacecraft.KP_HEADING * utils.wrap_to_pi(state.target_heading - state.heading)
+    steering = np.clip(np.arctan(state.length / velocity * heading_rate_command),
+                       -ControlledSpacecraft.MAX_STEERING_ANGLE, ControlledSpacecraft.MAX_STEERING_ANGLE)
+    acceleration = ControlledSpacecraft.KP_A * (state.target_velocity - state.velocity)
+    return state._replace(steering=np.where(state.controlled, steering, state.steering),
+                          acceleration=np.where(state.controlled, acceleration, state.acceleration))
+
+
+def kinematics(state, dt):
+    """
+        Integrate the kinematics of all spacecrafts over a timestep.
+
+    :param state: a SpaceState
+    :param dt: timestep of integration of the model [s]
+    :return: the propagated SpaceState
+    """
+    velocity = state.velocity
+    steering = np.where(state.crashed, 0, state.steering)
+    acceleration = np.where(state.crashed, -velocity, state.acceleration)
+    acceleration = np.where(velocity > state.max_velocity,
+                            np.minimum(acceleration, state.max_velocity - velocity), acceleration)
+    acceleration = np.where(velocity < -state.max_velocity,
+                            np.maximum(acceleration, state.max_velocity - velocity), acceleration)
+    direction = np.stack((np.cos(state.heading), np.sin(state.heading)), axis=-1)
+    return state._replace(position=state.position + (velocity * dt)[:, None] * direction,
+                          heading=state.heading + velocity * np.tan(steering) / state.length * dt,
+                          velocity=velocity + acceleration * dt,
+                          steering=steering,
+                          acceleration=acceleration)
+
+
+def collisions(state):
+    """
+        Flag the spacecrafts whose triangles intersect.
+
+        Colliding spacecrafts are marked as crashed, and take the velocity of smallest magnitude among the
+        spacecrafts they collided with.
+
+    :param state: a SpaceState
+    :return: the SpaceState with updated crash flags and velocities
+    """
+    vertices = _triangle_vertices(state.position, 0.9 * state.length, 0.9 * state.width, state.heading)
+    t1, t2 = vertices[:, None], vertices[None, :]
+    hit = ~(_separated(t1, t2) | _separated(t2, t1))
+
+    distance = np.linalg.norm(state.position[:, None] - state.position[None, :], axis=-1)
+    enabled = state.collisions_enabled[:, None] & state.collisions_enabled[None, :]
+    hit &= enabled & (distance <= np.maximum(state.length[:, None], state.length[None, :]))
+    hit &= ~np.eye(len(state.velocity), dtype=bool) & ~(state.crashed[:, None] & state.crashed[None, :])
+
+    partner = np.argmin(np.where(hit, np.abs(state.velocity)[None, :], np.inf), axis=1)
+    partner_velocity = state.velocity[partner]
+    collided = hit.any(axis=1)
+    velocity = np.where(collided & (np.abs(partner_velocity) < np.abs(state.velocity)),
+                        partner_velocity, state.velocity)
+    return state._replace(velocity=velocity, crashed=state.crashed | collided)
+
+
+def step(state, actions, dt):
+    """
+        Perform one simulation step.
+
+    :param state: a SpaceState
+    :param actions: the action index of every spacecraft, of shape (N,)
+    :param dt: timestep [s]
+    :return: the next SpaceState
+    """
+    return collisions(kinematics(control(apply_actions(state, actions)), dt))
+
+
+def simulate(state, actions, agents, dt, substeps):
+    """
+        Perform several simulation steps, the actions being applied on the first one only.
+
+        As in AbstractEnv._simulate(), the simulation halts after the first step on which an agent is crashed. The
+        steps are computed in double precision.
+
+    :param state: a SpaceState
+    :param actions: the action index of every spacecraft, of shape (N,)
+    :param agents: whether each spacecraft is controlled by the agent, of shape (N,)
+    :param dt: timestep [s]
+    :param substeps: the number of steps
+    :return: the final SpaceState, and the number of steps performed
+    """
+    with jax.enable_x64(True):
+        state = SpaceState(*(np.asarray(value) for value in state))
+        return _simulate(state, np.asarray(actions), np.asarray(agents, dtype=bool), dt, substeps=substeps)
+
+
+@partial(jax.jit, static_argnames=("substeps",))
+def _simulate(state, actions, agents, dt, substeps):
+    def substep(carry, k):
+        state, performed = carry
+        halted = (k > 0) & np.any(state.crashed & agents)
+        next_state = step(state, np.where(k == 0, actions, IDLE), dt)
+        state = jax.tree_util.tree_map(lambda old, new: np.where(halted, old, new), state, next_state)
+        return (state, performed + ~halted), None
+
+    (state, performed), _ = lax.scan(substep, (state, 0), np.arange(substeps))
+    return state, performed
+
+
+def _triangle_vertices(center, length, width, angle):
+    """
+        Vertices of isocele triangles, as in utils.triangle_vertices.
+    """
+    forward = np.stack((np.cos(angle), np.sin(angle)), axis=-1)
+    left = np.stack((-forward[..., 1], forward[..., 0]), axis=-1)
+    apex = center + (2.0/3.0*length)[..., None] * forward
+    base = center - (1.0/3.0*length)[..., None] * forward
+    side = (width / 2)[..., None] * left
+    return np.stack((apex, base + side, base - side), axis=-2)
+
+
+def _separated(edges, points):
+    """
+        Do all the points lay on the external side of one of the edges, as in utils.tri_tri_2d?
+    """
+    start = edges[..., :, None, :]
+    end = np.roll(edges, -1, axis=-2)[..., :, None, :]
+    point = points[..., None, :, :]
+    side = (end[..., 0] - start[..., 0]) * (point[..., 1] - start[..., 1]) - \
+        (end[..., 1] - start[..., 1]) * (point[..., 0] - start[..., 0])
+    return np.all(side < 0, axis=-1).any(axis=-1)
@@ -0,0 +1,107 @@
+from __future__ import division, print_function
+
+import numpy as np
+import pygame
+
+from space_env.spacecraft.graphics import VehicleGraphics
+
+
+class SpaceSurface(pygame.Surface):
+    """
+        A pygame Surface implementing a local coordinate system so that we can move and zoom in the displayed area.
+    """
+    BLACK = (0, 0, 0)
+    GREY = (100, 100, 100)
+    WHITE = (255, 255, 255)
+    INITIAL_SCALING = 2.0
+    INITIAL_CENTERING = [0.5, 0.5]
+    SCALING_FACTOR = 1.3
+    MOVING_FACTOR = 0.1
+
+    def __init__(self, size, flags, surf):
+        super(SpaceSurface, self).__init__(size, flags, surf)
+        self.origin = np.array([0, 0])
+        self.scaling = self.INITIAL_SCALING
+        self.centering_position = self.INITIAL_CENTERING
+
+    def pix(self, length):
+        """
+            Convert a distance [m] to pixels [px].
+
+        :param length: the input distance [m]
+        :return: the corresponding size [px]
+        """
+        return int(length * self.scaling)
+
+    def pos2pix(self, x, y):
+        """
+            Convert two world coordinates [m] into a position in the surface [px]
+
+        :param x: x world coordinate [m]
+        :param y: y world coordinate [m]
+        :return: the coordinates of the corresponding pixel [px]
+        """
+        return self.pix(x - self.origin[0]), self.pix(y - self.origin[1])
+
+    def vec2pix(self, vec):
+        """
+             Convert a world position [m] into a position in the surface [px].
+        :param vec: a world position [m]
+        :return: the coordinates of the corresponding pixel [px]
+        """
+        return self.pos2pix(vec[0], vec[1])
+
+    def move_display_window_to(self, position):
+        """
+            Set the origin of the displayed area to center on a given world position.
+        :param position: a world position [m]
+        """
+        self.origin = position - np.array(
+            [self.centering_position[0] * self.get_width() / self.scaling,
+             self.centering_position[1] * self.get_height() / self.scaling])
+
+    def handle_event(self, event):
+        """
+            Handle pygame events for moving and zooming in the displayed area.
+
+        :param event: a pygame event
+        """
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_l:
+                self.scaling *= 1 / self.SCALING_FACTOR
+            if event.key == pygame.K_o:
+                self.scaling *= self.SCALING_FACTOR
+            if event.key == pygame.K_m:
+                self.centering_position[0] -= self.MOVING_FACTOR
+            if event.key == pygame.K_k:
+                self.centering_position[0] += self.MOVING_FACTOR
+
+
+class SpaceGraphics(object):
+    """
+        A visualization of a space and the spacecrafts flying in it.
+    """
+    @classmethod
+    def display(cls, space, surface):
+        """
+            Display the space background on a surface.
+
+        :param space: the space to be displayed
+        :param surface: the pygame surface
+        """
+        surface.fill(surface.BLACK)
+
+    @classmethod
+    def display_traffic(cls, space, surface, simulation_frequency=15, offscreen=False):
+        """
+            Display the spacecrafts on a surface, with their history if recorded.
+
+        :param space: the space to be displayed
+        :param surface: the pygame surface
+        :param simulation_frequency: simulation frequency
+        :param offscreen: render without displaying on a screen
+        """
+        for v in space.spacecrafts:
+            if space.record_history:
+                VehicleGraphics.display_history(v, surface, simulation=simulation_frequency, offscreen=offscreen)
+            VehicleGraphics.display(v, surface, offscreen=offscreen)
@@ -0,0 +1,40 @@
+import numpy as np
+
+from space_env.space.broad_phase import SpatialHashGrid
+
+
+def separated_positions(np_random, count, radius, separation, max_rounds=50):
+    """
+        Sample positions uniformly in a disc centered on the origin, at a minimum distance from each other.
+
+        The positions are drawn by rejection sampling, a batch of candidates at a time: the pairs of positions closer
+        than the separation are found with a spatial hash grid, and a candidate is rejected if it is too close to an
+        accepted position or to an earlier candidate. Each round draws more candidates than the missing positions, so
+        that a few rounds are enough unless the disc is nearly full.
+
+    :param np_random: the random number generator
+    :param count: the number of positions
+    :param radius: the radius of the disc [m]
+    :param separation: the minimum distance between two positions [m]
+    :param max_rounds: the maximum number of batches of candidates
+    :return: the positions, of shape (count, 2)
+    """
+    accepted = np.zeros((0, 2))
+    for _ in range(max_rounds):
+        missing = count - len(accepted)
+        if missing <= 0:
+            break
+        candidates_count = 2 * missing + 16
+        distance = radius * np.sqrt(np_random.uniform(size=candidates_count))
+        angle = np_random.uniform(-np.pi, np.pi, candidates_count)
+        candidates = distance[:, None] * np.stack((np.cos(angle), np.sin(angle)), axis=-1)
+        if separation > 0:
+            _, j = SpatialHashGrid().pairs(np.concatenate((accepted, candidates)), separation)
+            rejected = np.zeros(candidates_count, dtype=bool)
+            rejected[j[j >= len(accepted)] - len(accepted)] = True
+            candidates = candidates[~rejected]
+        accepted = np.concatenate((accepted, candidates[:missing]))
+    if len(accepted) < count:
+        raise ValueError("Could not place {} spacecrafts {} m apart in a disc of radius {} m"
+                         .format(count, separation, radius))
+    return accepted
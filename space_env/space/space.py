@@ -1,17 +1,27 @@
-import jax.numpy as np
+import copy
 import logging
 
-from space_env.logger import Loggable
-from space_env.spacecraft.dynamics import Obstacle
+import numpy as np
+
+from space_env.logger import ColumnarLog, Loggable
+from space_env.space.broad_phase import SpatialHashGrid
+from space_env.space.fleet import Fleet
+from space_env.space.spatial_index import SpatialIndex
+from space_env.spacecraft.behavior import IDMSpacecraft
+from space_env.spacecraft.dynamics import Obstacle, Spacecraft
 
 logger = logging.getLogger(__name__)
 
 class Space(Loggable):
     """
         An area and a set of spacecrafts flying around
+
+        The dynamical states of the spacecrafts are stored in a Fleet owned by the space, and their positions are
+        indexed by a SpatialIndex for neighbour queries, rebuilt after each step.
     """
 
-    def __init__(self, spacecrafts=None, np_random=None, record_history=False):
+    def __init__(self, spacecrafts=None, np_random=None, record_history=False, broad_phase=None, log_path=None,
+                 integrator="euler", continuous_collisions=False):
         """
             New road.
 
@@ -19,72 +29,276 @@ class Space(Loggable):
         :param spacecrafts: the spacecrafts driving on the road
         :param np.random.RandomState np_random: a random number generator for spacecraft behaviour
         :param record_history: whether the recent trajectories of spacecrafts should be recorded for display
+        :param broad_phase: the BroadPhase selecting the pairs of spacecrafts to check for collision, a
+                            SpatialHashGrid by default
+        :param log_path: the path of a Parquet file to stream the log of the space to, if any
+        :param integrator: the integration scheme of the kinematics, see Fleet.step()
+        :param continuous_collisions: whether collisions should be detected along the motion of the spacecrafts
+                                      during each step, rather than between their final poses only
         """
+        self.fleet = Fleet(integrator=integrator)
+        self._spatial_index = None
         self.spacecrafts = spacecrafts or []
         self.np_random = np_random if np_random else np.random.RandomState()
         self.record_history = record_history
+        self.broad_phase = broad_phase or SpatialHashGrid()
+        self.continuous_collisions = continuous_collisions
+        self.contacts = (np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0))
+        self.time = 0.0
+        self.profiler = None
+        self.log = ColumnarLog(Spacecraft.LOG_DTYPES, path=log_path)
+
+    @property
+    def spacecrafts(self):
+        return self.fleet.spacecrafts
+
+    @spacecrafts.setter
+    def spacecrafts(self, spacecrafts):
+        self.fleet.bind(spacecrafts)
+        self._spatial_index = None
+
+    @property
+    def spatial_index(self):
+        """
+            The spatial index of the current positions of the spacecrafts, built on first use after each step.
+        """
+        self.fleet.sync()
+        if self._spatial_index is None or self._spatial_index.count != self.fleet.count:
+            self._spatial_index = SpatialIndex(self.fleet.position[:self.fleet.count])
+        return self._spatial_index
 
     def close_spacecrafts_to(self, spacecraft, distance, count=None, sort=False, see_behind=True):
-        spacecrafts = [v for v in self.spacecrafts
-                    if np.linalg.norm(v.position - spacecraft.position) < distance
-                    and v is not spacecraft
-                    and (see_behind or -2*spacecraft.LENGTH < spacecraft.lane_distance_to(v))]
-        if sort:
-            spacecrafts = sorted(spacecrafts, key=lambda v: abs(spacecraft.lane_distance_to(v)))
-        if count:
-            spacecrafts = spacecrafts[:count]
-        return spacecrafts
-
-    def act(self):
+        """
+            Find the spacecrafts within a distance of a given spacecraft.
+
+        :param spacecraft: the reference spacecraft
+        :param distance: the search distance [m]
+        :param count: the maximum number of spacecrafts to return, the closest ones being kept
+        :param sort: whether the spacecrafts should be sorted by increasing distance
+        :param see_behind: whether the spacecrafts far behind the reference spacecraft should be included
+        :return: the list of close spacecrafts
+        """
+        index = self.spatial_index
+        exclude = spacecraft.index if spacecraft.fleet is self.fleet else None
+        if count or sort:
+            rows = index.query_nearest(spacecraft.position, count or self.fleet.count, distance, exclude=exclude)
+        else:
+            rows = index.query_radius(spacecraft.position, distance)
+            rows = rows[rows != exclude]
+        if not see_behind:
+            rows = rows[-2*spacecraft.LENGTH < self.longitudinal_distances(spacecraft, rows)]
+        return [self.spacecrafts[i] for i in rows]
+
+    def longitudinal_distances(self, spacecraft, rows):
+        """
+            Distances of spacecrafts along the heading of a reference spacecraft.
+
+        :param spacecraft: the reference spacecraft
+        :param rows: the fleet indexes of the spacecrafts
+        :return: the array of their longitudinal distances [m], positive ahead of the reference spacecraft
+        """
+        direction = np.array([np.cos(spacecraft.heading), np.sin(spacecraft.heading)])
+        return (self.fleet.position[rows] - spacecraft.position) @ direction
+
+    def act(self, rows=None):
         """
             Decide the actions of each entity.
+
+            The spacecrafts with a behaviour model, most of the traffic, all decide at once, see
+            IDMSpacecraft.act_all(). The other spacecrafts act one by one.
+
+        :param rows: the fleet indexes of the spacecrafts that decide, all of them by default
         """
-        for spacecraft in self.spacecrafts:
-            spacecraft.act()
+        self.fleet.sync()
+        rows = np.arange(self.fleet.count) if rows is None else np.asarray(rows, dtype=int)
+        modelled = self.fleet.behavior[rows] > 0
+        if modelled.any():
+            IDMSpacecraft.act_all(self, rows[modelled])
+        for index in rows[~modelled]:
+            self.spacecrafts[index].act()
 
-    def step(self, dt):
+    def step(self, dt, check_collisions=True):
         """
-            Step the dynamics of each entity on the road.
+            Step the dynamics of all entities in the space at once.
+
+            The pairs of spacecrafts that came into contact are stored in contacts, as the arrays (i, j, t) of their
+            fleet indexes and of their first contact times since the start of the step [s]. Without continuous
+            collisions, only the poses at the end of the step are tested, and the contact time is dt.
 
         :param dt: timestep [s]
+        :param check_collisions: whether collisions should be checked, which can be skipped during a duration where
+                                 they are known to be impossible, see safe_duration()
         """
-        for spacecraft in self.spacecrafts:
-            spacecraft.step(dt)
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.clock()
+        self.fleet.sync()
+        poses = None
+        if check_collisions and self.continuous_collisions:
+            poses = (self.fleet.position[:self.fleet.count].copy(), self.fleet.heading[:self.fleet.count].copy())
+        self.fleet.step(dt)
+        if profiler is not None:
+            profiler.lap("kinematics", start)
+        if check_collisions:
+            i, j, t = self.check_collisions(poses)
+            self.contacts = (i, j, t * dt)
+        else:
+            self.contacts = (np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0))
+            if profiler is not None:
+                profiler.count("skipped_collision_checks")
+        # The colliding spacecrafts are rewound to their contact poses before being recorded
+        if profiler is not None:
+            start = profiler.clock()
+        self.after_step(dt)
+        if profiler is not None:
+            profiler.lap("after_step", start)
+
+    def after_step(self, dt=0):
+        """
+            Update the data derived from the spacecrafts states, once they have been stepped.
+
+            The simulation time is advanced, the spatial index is invalidated, and the current states of the entities
+            are recorded in the history of the fleet if enabled.
+        """
+        self.time += dt
+        self._spatial_index = None
+        if self.record_history:
+            self.fleet.record()
 
+    def clone(self, np_random=None):
+        """
+            Copy the space, with new spacecrafts bound to a fleet of its own.
+
+            The spacecrafts are shallow copies: their dynamical states are copied along with the fleet, but their
+            other attributes are shared with the original ones. The clone starts with an empty log.
+
+        :param np_random: the random number generator of the copy, a copy of the current one by default
+        :return: the copied space
+        """
+        self.fleet.sync()
+        space = copy.copy(self)
+        space.np_random = np_random if np_random is not None else copy.deepcopy(self.np_random)
+        space.log = ColumnarLog(Spacecraft.LOG_DTYPES)
+        space._spatial_index = None
+        spacecrafts = []
         for spacecraft in self.spacecrafts:
-            for other in self.spacecrafts:
-                spacecraft.check_collision(other)
+            spacecraft = copy.copy(spacecraft)
+            spacecraft.space = space
+            spacecraft.log = None
+            spacecrafts.append(spacecraft)
+        space.fleet = Fleet(max(len(spacecrafts), 1), integrator=self.fleet.integrator)
+        space.spacecrafts = spacecrafts
+        return space
+
+    def collision_candidates(self, poses=None):
+        """
+            Run the broad phase of collision detection.
 
-    def neighbour_spacecrafts(self, spacecraft):
+        :param poses: the (position, heading) columns of the fleet at the start of the step, for continuous detection
+        :return: two arrays (i, j) of the fleet indexes of the pairs of spacecrafts close enough to collide
+        """
+        return self.fleet.collision_candidates(self.broad_phase, start=poses)
+
+    def safe_duration(self, horizon, dt):
+        """
+            A duration during which no pair of spacecrafts can come into contact, from their current states.
+
+            Each spacecraft is bounded by a disc of its length, moving with a bounded speed: its current speed or its
+            max_velocity, whichever is larger, plus one step of its current acceleration, since Fleet.step() only
+            lets a spacecraft exceed its max_velocity by a single step. Two spacecrafts cannot touch before their
+            discs could meet when closing at the sum of their speed bounds. Only the pairs that could meet within the
+            horizon are found by the broad phase. The bound is infinite, and the duration null, if the max_velocity
+            of a spacecraft is.
+
+        :param horizon: the maximum duration of interest [s]
+        :param dt: the timestep [s]
+        :return: the safe duration, in [0, horizon] [s]
+        """
+        fleet = self.fleet
+        fleet.sync()
+        rows = np.flatnonzero(fleet.collisions_enabled[:fleet.count])
+        if len(rows) < 2:
+            return horizon
+        speed = np.maximum(np.abs(fleet.velocity[rows]), fleet.max_velocity[rows]) + \
+            np.abs(fleet.acceleration[rows]) * dt
+        if not np.all(np.isfinite(speed)):
+            return 0.
+        length = fleet.length[rows]
+        i, j = self.broad_phase.pairs(fleet.position[rows], 2 * length.max() + 2 * speed.max() * horizon)
+        if not len(i):
+            return horizon
+        distance = np.linalg.norm(fleet.position[rows[j]] - fleet.position[rows[i]], axis=1)
+        gap = distance - length[i] - length[j]
+        return float(np.clip(np.min(gap / (speed[i] + speed[j])), 0, horizon))
+
+    def check_collisions(self, poses=None):
+        """
+            Resolve the candidate pairs of the broad phase with a single vectorized triangle intersection test.
+
+        :param poses: the (position, heading) columns of the fleet at the start of the step, to detect the collisions
+                      along the motion of the spacecrafts rather than between their final poses only
+        :return: the contacts (i, j, t), see Fleet.resolve_collisions()
+        """
+        profiler = self.profiler
+        if profiler is None:
+            return self.fleet.resolve_collisions(*self.collision_candidates(poses), start=poses)[1]
+        start = profiler.clock()
+        i, j = self.collision_candidates(poses)
+        start = profiler.lap("broad_phase", start)
+        tested, contacts = self.fleet.resolve_collisions(i, j, start=poses)
+        profiler.lap("narrow_phase", start)
+        profiler.count("broad_phase_pairs", len(i))
+        profiler.count("narrow_phase_pairs", tested)
+        profiler.count("collisions", len(contacts[0]))
+        return contacts
+
+    def neighbour_spacecrafts(self, spacecraft, distance=None):
         """
             Find the neighboring spacecrafts of a given spacecraft.
+
+            The neighbours are the closest spacecrafts ahead of and behind the spacecraft, within a corridor of half
+            its length on each side of its heading line.
         :param spacecraft: the spacecraft whose neighbours must be found
-        :return: its neighboring spacecraft
+        :param distance: the search distance [m], unlimited by default
+        :return: its preceding spacecraft, and its following spacecraft
         """
+        rows = self.spatial_index.query_radius(spacecraft.position, np.inf if distance is None else distance)
+        if spacecraft.fleet is self.fleet:
+            rows = rows[rows != spacecraft.index]
+        longitudinal = self.longitudinal_distances(spacecraft, rows)
+        lateral = np.sqrt(np.maximum(np.sum((self.fleet.position[rows] - spacecraft.position) ** 2, axis=1)
+                                     - longitudinal ** 2, 0))
+        in_corridor = lateral < spacecraft.LENGTH / 2
+        rows, longitudinal = rows[in_corridor], longitudinal[in_corridor]
+        ahead, behind = longitudinal > 0, longitudinal <= 0
+        v_front = self.spacecrafts[rows[ahead][np.argmin(longitudinal[ahead])]] if ahead.any() else None
+        v_rear = self.spacecrafts[rows[behind][np.argmax(longitudinal[behind])]] if behind.any() else None
+        return v_front, v_rear
 
-        lane = self.network.get_lane(lane_index)
-        s = self.network.get_lane(lane_index).local_coordinates(spacecraft.position)[0]
-        s_front = s_rear = None
-        v_front = v_rear = None
-        for v in self.spacecrafts:
-            if v is not spacecraft and True :
+    def dump(self, time=None):
+        """
+            Dump the data of all entities in the space, with a single batched append to the log of the space.
 
-        return None
+        :param time: the simulation time [s], the time of the space by default
+        """
+        self.fleet.sync()
+        rows = np.flatnonzero([not isinstance(v, Obstacle) for v in self.spacecrafts])
+        self.log.append(**self.fleet.log_values(rows, self.time if time is None else time))
 
-    def dump(self):
+    def get_log(self):
         """
-            Dump the data of all entities in the space
+            Cast the log of the space into a single pandas DataFrame, with one row per spacecraft and dump.
+
+            If the log is streamed to a Parquet file, only the records not written yet are returned.
+        :return: the DataFrame of the logged states
         """
-        for v in self.spacecrafts:
-            if not isinstance(v, Obstacle):
-                v.dump()
+        return self.log.to_dataframe()
 
-    def get_log(self):
+    def close(self):
         """
-            Concatenate the logs of all entities on the road.
-        :return: the concatenated log.
+            Write the remaining records of the log, and close its Parquet file if any.
         """
-        return pd.concat([v.get_log() for v in self.spacecrafts])
+        self.log.close()
 
     def __repr__(self):
         return self.spacecrafts.__repr__()
\ No newline at end of file
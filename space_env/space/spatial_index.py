@@ -0,0 +1,191 @@
+from functools import lru_cache
+
+import numpy as np
+
+from space_env.space.broad_phase import BroadPhase, expand_ranges
+
+
+class SpatialIndex(object):
+    """
+        A uniform grid index of a set of positions, for neighbour queries.
+
+        The points are sorted by grid cell, so that the points of a column of cells are contiguous: a radius query only
+        visits the few columns of cells it overlaps. The index is built for a fixed set of positions, and must be
+        rebuilt when they move.
+    """
+
+    CELL_SIZE = 50  # [m]
+
+    """ Number of points under which all pairs are tested rather than the pairs of neighbouring cells """
+    BRUTE_FORCE_COUNT = 32
+
+    def __init__(self, positions, cell_size=CELL_SIZE):
+        """
+        :param positions: an array of positions, of shape (N, 2)
+        :param cell_size: the size of the grid cells [m]
+        """
+        self.positions = np.asarray(positions, dtype=float)
+        self.cell_size = cell_size
+        self.count = len(self.positions)
+        self._pairs = {}
+        if self.count:
+            cells = np.floor(self.positions / cell_size).astype(np.int64)
+            self.origin = cells.min(axis=0) - 1
+            cells -= self.origin
+            self.rows = cells[:, 1].max() + 2
+            self.columns = cells[:, 0].max() + 2
+            keys = cells[:, 0] * self.rows + cells[:, 1]
+            self.order = np.argsort(keys, kind='stable')
+            self.sorted_keys = keys[self.order]
+
+    def query_radius(self, point, radius):
+        """
+            Find the points within a distance of a given point.
+
+        :param point: the query point, of shape (2,)
+        :param radius: the query distance
+        :return: the indexes of the points closer than the distance, in arbitrary order
+        """
+        if not self.count:
+            return np.zeros(0, dtype=int)
+        if not np.isfinite(radius):
+            return np.arange(self.count)
+        bounds = np.floor((np.asarray(point) + [[-radius], [radius]]) / self.cell_size) - self.origin
+        low = np.maximum(bounds[0], 0).astype(np.int64)
+        high = np.minimum(bounds[1], [self.columns - 1, self.rows - 1]).astype(np.int64)
+        columns = np.arange(low[0], high[0] + 1)
+        starts = np.searchsorted(self.sorted_keys, columns * self.rows + low[1], side='left')
+        ends = np.searchsorted(self.sorted_keys, columns * self.rows + high[1], side='right')
+        candidates = self.order[expand_ranges(starts, ends)[1]]
+        delta = self.positions[candidates] - point
+        return candidates[np.einsum('ij,ij->i', delta, delta) < radius ** 2]
+
+    def query_nearest(self, point, k, radius=None, exclude=None):
+        """
+            Find the k points closest to a given point, using a partial selection.
+
+        :param point: the query point, of shape (2,)
+        :param k: the number of points
+        :param radius: only consider the points within this distance, if any
+        :param exclude: the index of a point to exclude from the results, if any
+        :return: the indexes of the closest points, sorted by increasing distance
+        """
+        candidates = np.arange(self.count) if radius is None else self.query_radius(point, radius)
+        if exclude is not None:
+            candidates = candidates[candidates != exclude]
+        delta = self.positions[candidates] - point
+        distances = np.einsum('ij,ij->i', delta, delta)
+        if k < len(candidates):
+            closest = np.argpartition(distances, k)[:k]
+            candidates, distances = candidates[closest], distances[closest]
+        return candidates[np.argsort(distances, kind='stable')]
+
+    def pairs(self, radius):
+        """
+            Find the pairs of points within a distance.
+
+            The columns of cells within the distance of the cell of each point are visited in the sorted points of
+            the index, and the pairs are cached by distance, for the lifetime of the index.
+
+        :param radius: the pairing distance
+        :return: two index arrays (i, j) with i < j, each unordered pair appearing once
+        """
+        if radius in self._pairs:
+            return self._pairs[radius]
+        if self.count < self.BRUTE_FORCE_COUNT or not np.isfinite(radius):
+            i, j = _all_pairs(self.count)
+        else:
+            reach = int(np.ceil(radius / self.cell_size))
+            column, row = np.divmod(self.sorted_keys, self.rows)
+            low = np.maximum(row - reach, 0)
+            high = np.minimum(row + reach, self.rows - 1)
+            i, j = [], []
+            for dx in range(reach + 1):
+                # The points of the same column are only paired with the next ones, to visit each pair once
+                starts = np.searchsorted(self.sorted_keys, (column + dx) * self.rows + low, side='left')
+                if dx == 0:
+                    starts = np.maximum(starts, np.arange(1, self.count + 1))
+                ends = np.searchsorted(self.sorted_keys, (column + dx) * self.rows + high, side='right')
+                k, l = expand_ranges(starts, ends)
+                i.append(self.order[k])
+                j.append(self.order[l])
+            i, j = np.concatenate(i), np.concatenate(j)
+        self._pairs[radius] = BroadPhase._within(self.positions, i, j, radius)
+        return self._pairs[radius]
+
+    def neighbours(self, radius):
+        """
+            Find the neighbours of every point.
+
+        :param radius: the neighbourhood distance
+        :return: two index arrays (i, j) such that j is a neighbour of i, sorted by i then by increasing distance
+        """
+        i, j = self.pairs(radius)
+        i, j = np.concatenate((i, j)), np.concatenate((j, i))
+        delta = self.positions[j] - self.positions[i]
+        order = np.lexsort((np.einsum('ij,ij->i', delta, delta), i))
+        return i[order], j[order]
+
+    def nearest_ahead(self, directions, radius, half_width, rows=None):
+        """
+            Find the closest point ahead of every point, within a corridor along its direction.
+
+            All the queries are answered at once from the pairs of neighbouring points, see pairs().
+
+        :param directions: the unit direction vectors of all the points, of shape (N, 2)
+        :param radius: the search distance
+        :param half_width: the half width of the corridors, a scalar or an array of shape (N,)
+        :param rows: the indexes of the querying points, all points by default
+        :return: the index of the point ahead of every point, -1 if none, and its distance along the direction of
+                 the querying point, inf if none, of shapes (N,)
+        """
+        pairs = self.pairs(radius)
+        delta = self.positions[pairs[1]] - self.positions[pairs[0]]
+        half_width = np.broadcast_to(half_width, (self.count,))
+        querying = np.ones(self.count, dtype=bool)
+        if rows is not None:
+            querying[:] = False
+            querying[rows] = True
+        # Each pair is tested in both directions, and only the pairs ahead are kept before sorting
+        i, j, longitudinal = [], [], []
+        for (a, b), sign in [(pairs, 1), (pairs[::-1], -1)]:
+            forward = directions[a]
+            along = sign * np.einsum('ij,ij->i', delta, forward)
+            lateral = np.abs(forward[:, 0] * delta[:, 1] - forward[:, 1] * delta[:, 0])
+            ahead = (along > 0) & (lateral < half_width[a]) & querying[a]
+            i.append(a[ahead])
+            j.append(b[ahead])
+            longitudinal.append(along[ahead])
+        i, j, longitudinal = np.concatenate(i), np.concatenate(j), np.concatenate(longitudinal)
+        order = np.lexsort((longitudinal, i))
+        i, j, longitudinal = i[order], j[order], longitudinal[order]
+        first = np.ones(len(i), dtype=bool)
+        first[1:] = i[1:] != i[:-1]
+        leaders = np.full(self.count, -1, dtype=int)
+        distances = np.full(self.count, np.inf)
+        leaders[i[first]] = j[first]
+        distances[i[first]] = longitudinal[first]
+        return leaders, distances
+
+    def nearest_neighbours(self, k, radius):
+        """
+            Find the k closest neighbours of every point, within a distance.
+
+        :param k: the number of neighbours
+        :param radius: the neighbourhood distance
+        :return: an index array of shape (N, k), sorted by increasing distance and padded with -1
+        """
+        i, j = self.neighbours(radius)
+        rank = np.arange(len(i)) - np.searchsorted(i, i, side='left')
+        kept = rank < k
+        nearest = np.full((self.count, k), -1, dtype=int)
+        nearest[i[kept], rank[kept]] = j[kept]
+        return nearest
+
+
+@lru_cache(maxsize=64)
+def _all_pairs(count):
+    """
+    :return: the index arrays (i, j) of all the pairs of count points with i < j
+    """
+    return np.triu_indices(count, k=1)
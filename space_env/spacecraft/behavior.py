@@ -0,0 +1,199 @@
+import numpy as np
+
+from space_env import utils
+from space_env.spacecraft.control import ControlledSpacecraft
+
+
+class IDMSpacecraft(ControlledSpacecraft):
+    """
+        A spacecraft using the Intelligent Driver Model to follow the spacecraft ahead of it.
+
+        - Longitudinal: the IDM model computes an acceleration given the preceding spacecraft's distance and velocity,
+          the leader being the closest spacecraft ahead of it within a corridor of its length;
+        - Lateral: the heading controller keeps the spacecraft flying towards its target heading.
+
+        The model and its parameters are stored in the fleet, so that the decisions of all the behaviour models of a
+        space are computed at once by act_all(), called by Space.act(). Subclasses overriding act() must set
+        BEHAVIOR to 0, so that their act() is called instead.
+    """
+
+    """ Code of the behaviour model in the fleet """
+    BEHAVIOR = 1
+
+    # Longitudinal policy parameters
+    ACC_MAX = 6.0  # [m/s2]
+    COMFORT_ACC_MAX = 3.0  # [m/s2]
+    COMFORT_ACC_MIN = -5.0  # [m/s2]
+    DISTANCE_WANTED = 5.0 + ControlledSpacecraft.LENGTH  # [m]
+    TIME_WANTED = 1.5  # [s]
+    DELTA = 4.0  # []
+    DELTA_RANGE = [3.5, 4.5]  # []
+
+    """ Search distance of the spacecraft ahead [m] """
+    PERCEPTION_DISTANCE = 300
+
+    def __init__(self,
+                 space,
+                 position,
+                 heading=0,
+                 velocity=0,
+                 target_velocity=None,
+                 target_heading=None,
+                 route=None):
+        super(IDMSpacecraft, self).__init__(space, position, heading, velocity, target_velocity, target_heading, route)
+        self.fleet.behavior[self.index] = self.BEHAVIOR
+        self.fleet.behavior_parameters[self.index] = 0
+        parameters = self.default_parameters()
+        self.fleet.behavior_parameters[self.index, :len(parameters)] = parameters
+
+    def default_parameters(self):
+        """
+        :return: the parameters of the behaviour model, stored in the fleet
+        """
+        return [self.COMFORT_ACC_MAX, -self.COMFORT_ACC_MIN, self.DISTANCE_WANTED, self.TIME_WANTED, self.DELTA]
+
+    def randomize_behavior(self):
+        self.fleet.behavior_parameters[self.index, 4] = \
+            self.space.np_random.uniform(low=self.DELTA_RANGE[0], high=self.DELTA_RANGE[1])
+
+    def act(self, action=None):
+        """
+            Execute the behaviour model of this spacecraft alone.
+
+            The high-level action is ignored: the targets are only changed by the model.
+
+        :param action: a high-level action
+        """
+        front, _ = self.space.neighbour_spacecrafts(self, self.PERCEPTION_DISTANCE)
+        rows = np.array([self.index])
+        leaders = np.array([front.index if front else -1])
+        distances = np.array([self.space.longitudinal_distances(self, leaders)[0] if front else np.inf])
+        self.act_rows(self.fleet, rows, leaders, distances)
+
+    @classmethod
+    def act_all(cls, space, rows=None):
+        """
+            Execute the behaviour models of many spacecrafts of a space at once.
+
+            The leaders of all the spacecrafts are found by a single query of the spatial index of the space, and the
+            commands of the spacecrafts of each model are computed by array operations.
+
+        :param space: the space
+        :param rows: the fleet indexes of the spacecrafts, all spacecrafts with a behaviour model by default
+        """
+        fleet = space.fleet
+        fleet.sync()
+        behavior = fleet.behavior[:fleet.count]
+        rows = np.flatnonzero(behavior) if rows is None else np.asarray(rows)
+        if not len(rows):
+            return
+        heading = fleet.heading[:fleet.count]
+        directions = np.stack((np.cos(heading), np.sin(heading)), axis=-1)
+        leaders, distances = space.spatial_index.nearest_ahead(directions, cls.PERCEPTION_DISTANCE,
+                                                               fleet.length[:fleet.count] / 2, rows)
+        for model in (IDMSpacecraft, LinearSpacecraft):
+            model_rows = rows[behavior[rows] == model.BEHAVIOR]
+            if len(model_rows):
+                model.act_rows(fleet, model_rows, leaders[model_rows], distances[model_rows])
+
+    @classmethod
+    def act_rows(cls, fleet, rows, leaders, distances):
+        """
+            Compute and store the commands of spacecrafts of this model.
+
+        :param fleet: the fleet of the spacecrafts
+        :param rows: the fleet indexes of the spacecrafts
+        :param leaders: the fleet indexes of their leaders, -1 if none
+        :param distances: the distances to their leaders along their headings [m], inf if none
+        """
+        gap, front_velocity = cls.leader_gaps(fleet, rows, leaders, distances)
+        parameters = fleet.behavior_parameters[rows]
+        fleet.acceleration[rows] = np.clip(cls.accelerations(fleet, rows, parameters, gap, front_velocity),
+                                           -cls.ACC_MAX, cls.ACC_MAX)
+        fleet.steering[rows] = cls.steerings(fleet, rows, parameters)
+
+    @staticmethod
+    def leader_gaps(fleet, rows, leaders, distances):
+        """
+        :return: the gaps between the spacecrafts and their leaders [m], inf if none, and the velocities of the
+                 leaders along the headings of the spacecrafts [m/s]
+        """
+        found = leaders >= 0
+        gap = distances - np.where(found, (fleet.length[rows] + fleet.length[leaders]) / 2, 0)
+        relative_heading = fleet.heading[leaders] - fleet.heading[rows]
+        front_velocity = np.where(found, fleet.velocity[leaders] * np.cos(relative_heading), fleet.velocity[rows])
+        return gap, front_velocity
+
+    @classmethod
+    def accelerations(cls, fleet, rows, parameters, gap, front_velocity):
+        """
+            Compute the IDM accelerations.
+
+        :param fleet: the fleet of the spacecrafts
+        :param rows: the fleet indexes of the spacecrafts
+        :param parameters: their model parameters (a, b, s0, T, delta)
+        :param gap: the gaps to their leaders [m], inf if none
+        :param front_velocity: the velocities of their leaders along their headings [m/s]
+        :return: the acceleration commands [m/s2]
+        """
+        a, b, s0, time_wanted, delta = parameters.T
+        velocity = fleet.velocity[rows]
+        target_velocity = np.abs(utils.not_zero(fleet.target_velocity[rows]))
+        acceleration = a * (1 - np.power(np.maximum(velocity, 0) / target_velocity, delta))
+        desired_gap = s0 + np.maximum(velocity, 0) * time_wanted + \
+            velocity * (velocity - front_velocity) / (2 * np.sqrt(a * b))
+        acceleration -= a * np.power(desired_gap / utils.not_zero(gap), 2)
+        return acceleration
+
+    @classmethod
+    def steerings(cls, fleet, rows, parameters):
+        """
+            Compute the steering commands that follow the target headings.
+
+        :param fleet: the fleet of the spacecrafts
+        :param rows: the fleet indexes of the spacecrafts
+        :param parameters: their model parameters
+        :return: the steering commands [rad]
+        """
+        return cls.steering_commands(fleet, rows)
+
+
+class LinearSpacecraft(IDMSpacecraft):
+    """
+        A spacecraft whose longitudinal and lateral controllers are linear with respect to parameters.
+
+        - The acceleration is linear in the velocity error, the closing velocity to the leader and the violation of
+          the safe distance to the leader;
+        - the heading rate is proportional to the heading error.
+    """
+
+    BEHAVIOR = 2
+
+    ACCELERATION_PARAMETERS = [0.3, 0.3, 2.0]
+    STEERING_PARAMETERS = [ControlledSpacecraft.KP_HEADING]
+
+    """ Range of the randomized parameters """
+    ACCELERATION_RANGE = np.array([0.5 * np.array(ACCELERATION_PARAMETERS), 1.5 * np.array(ACCELERATION_PARAMETERS)])
+    STEERING_RANGE = np.array([0.5 * np.array(STEERING_PARAMETERS), 1.5 * np.array(STEERING_PARAMETERS)])
+
+    def default_parameters(self):
+        return self.ACCELERATION_PARAMETERS + self.STEERING_PARAMETERS
+
+    def randomize_behavior(self):
+        low = np.concatenate((self.ACCELERATION_RANGE[0], self.STEERING_RANGE[0]))
+        high = np.concatenate((self.ACCELERATION_RANGE[1], self.STEERING_RANGE[1]))
+        self.fleet.behavior_parameters[self.index, :len(low)] = \
+            low + self.space.np_random.uniform(size=len(low)) * (high - low)
+
+    @classmethod
+    def accelerations(cls, fleet, rows, parameters, gap, front_velocity):
+        velocity = fleet.velocity[rows]
+        safe_distance = cls.DISTANCE_WANTED + np.maximum(velocity, 0) * cls.TIME_WANTED
+        features = np.stack((fleet.target_velocity[rows] - velocity,
+                             np.minimum(front_velocity - velocity, 0),
+                             np.minimum(gap - safe_distance, 0)), axis=-1)
+        return np.einsum('ij,ij->i', parameters[:, :3], features)
+
+    @classmethod
+    def steerings(cls, fleet, rows, parameters):
+        return cls.steering_commands(fleet, rows, kp_heading=parameters[:, 3])
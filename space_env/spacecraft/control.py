@@ -1,6 +1,7 @@
-import jax.numpy as np
+import numpy as np
 from space_env import utils
 
+from space_env.space.fleet import FleetColumn
 from space_env.spacecraft.dynamics import Spacecraft
 
 class ControlledSpacecraft(Spacecraft):
@@ -9,29 +10,37 @@ class ControlledSpacecraft(Spacecraft):
         such as cruise control.
 
         - The longitudinal controller is a velocity controller;
-        - The lateral controller is a heading controller cascaded with a lateral position controller.
+        - The lateral controller is a heading controller.
+
+        The controller targets are stored in the fleet, so that they can also be tracked by array-based simulations.
     """
 
     TAU_A = 0.6  # [s]
     TAU_DS = 0.2  # [s]
-    PURSUIT_TAU = 1.5*TAU_DS  # [s]
     KP_A = 1 / TAU_A
     KP_HEADING = 1 / TAU_DS
-    KP_LATERAL = 1 / 0.5  # [1/s]
     MAX_STEERING_ANGLE = np.pi / 3  # [rad]
 
     DELTA_VELOCITY = 5  # [m/s]
+    DELTA_HEADING = np.pi / 12  # [rad]
+
+    target_velocity = FleetColumn("target_velocity")
+    target_heading = FleetColumn("target_heading")
 
     def __init__(self,
                  space,
                  position,
                  heading=0,
                  velocity=0,
-                 target_lane_index=None,
                  target_velocity=None,
+                 target_heading=None,
                  route=None):
-        super(ControlledVehicle, self).__init__(space, position, heading, velocity)
-        self.target_velocity = target_velocity or self.velocity
+        super(ControlledSpacecraft, self).__init__(space, position, heading, velocity)
+        self.fleet.controlled[self.index] = True
+        self.fleet.delta_velocity[self.index] = self.DELTA_VELOCITY
+        self.fleet.delta_heading[self.index] = self.DELTA_HEADING
+        self.target_velocity = self.velocity if target_velocity is None else target_velocity
+        self.target_heading = self.heading if target_heading is None else target_heading
         self.route = route
 
     @classmethod
@@ -44,10 +53,19 @@ class ControlledSpacecraft(Spacecraft):
         :return: a new spacecraft at the same dynamical state
         """
         v = cls(spacecraft.space, spacecraft.position, heading=spacecraft.heading, velocity=spacecraft.velocity,
-                target_lane_index=spacecraft.target_lane_index, target_velocity=spacecraft.target_velocity,
+                target_velocity=spacecraft.target_velocity, target_heading=spacecraft.target_heading,
                 route=spacecraft.route)
         return v
 
+    @classmethod
+    def create_many(cls, space, positions, headings, velocities):
+        spacecrafts = super(ControlledSpacecraft, cls).create_many(space, positions, headings, velocities)
+        if spacecrafts:
+            rows = slice(spacecrafts[0].index, spacecrafts[-1].index + 1)
+            space.fleet.target_velocity[rows] = space.fleet.velocity[rows]
+            space.fleet.target_heading[rows] = space.fleet.heading[rows]
+        return spacecrafts
+
     def act(self, action=None):
         """
             Perform a high-level action to change the desired heading or velocity.
@@ -57,22 +75,145 @@ class ControlledSpacecraft(Spacecraft):
 
         :param action: a high-level action
         """
-        self.follow_road()
         if action == "FASTER":
-            self.target_velocity += self.DELTA_VELOCITY
+            self.target_velocity = self.clip_target_velocity(self.target_velocity + self.DELTA_VELOCITY)
         elif action == "SLOWER":
-            self.target_velocity -= self.DELTA_VELOCITY
+            self.target_velocity = self.clip_target_velocity(self.target_velocity - self.DELTA_VELOCITY)
         elif action == "RIGHT":
-            _from, _to, _id = self.target_lane_index
-            target_lane_index = _from, _to, np.clip(_id + 1, 0, len(self.road.network.graph[_from][_to]) - 1)
-            if self.road.network.get_lane(target_lane_index).is_reachable_from(self.position):
-                self.target_lane_index = target_lane_index
+            self.target_heading += self.DELTA_HEADING
         elif action == "LEFT":
-            _from, _to, _id = self.target_lane_index
-            target_lane_index = _from, _to, np.clip(_id - 1, 0, len(self.road.network.graph[_from][_to]) - 1)
-            if self.road.network.get_lane(target_lane_index).is_reachable_from(self.position):
-                self.target_lane_index = target_lane_index
+            self.target_heading -= self.DELTA_HEADING
 
-        action = {'steering': self.steering_control(self.target_lane_index),
+        action = {'steering': self.steering_control(self.target_heading),
                   'acceleration': self.velocity_control(self.target_velocity)}
-        super(ControlledVehicle, self).act(action)
\ No newline at end of file
+        super(ControlledSpacecraft, self).act(action)
+
+    @classmethod
+    def act_all(cls, fleet, rows, actions=None):
+        """
+            Perform high-level actions and low-level control of many controlled spacecrafts at once, as in act().
+
+        :param fleet: the fleet of the spacecrafts
+        :param rows: the fleet indexes of the spacecrafts
+        :param actions: the names of their high-level actions, if any, of shape (len(rows),)
+        """
+        rows = np.asarray(rows, dtype=int)
+        if actions is not None:
+            actions = np.asarray(actions)
+            velocity_change = (actions == "FASTER").astype(float) - (actions == "SLOWER")
+            target_velocity = np.clip(fleet.target_velocity[rows] + velocity_change * fleet.delta_velocity[rows],
+                                      fleet.min_target_velocity[rows], fleet.max_target_velocity[rows])
+            fleet.target_velocity[rows] = np.where(velocity_change != 0, target_velocity, fleet.target_velocity[rows])
+            heading_change = (actions == "RIGHT").astype(float) - (actions == "LEFT")
+            fleet.target_heading[rows] += heading_change * fleet.delta_heading[rows]
+
+        fleet.steering[rows] = cls.steering_commands(fleet, rows)
+        fleet.acceleration[rows] = cls.KP_A * (fleet.target_velocity[rows] - fleet.velocity[rows])
+
+    @classmethod
+    def steering_commands(cls, fleet, rows, kp_heading=None):
+        """
+            Compute the steering commands of many spacecrafts following their target headings, as in
+            steering_control().
+
+        :param fleet: the fleet of the spacecrafts
+        :param rows: the fleet indexes of the spacecrafts
+        :param kp_heading: the heading gains, KP_HEADING by default
+        :return: the steering wheel angle commands [rad]
+        """
+        kp_heading = cls.KP_HEADING if kp_heading is None else kp_heading
+        heading_rate_command = kp_heading * utils.wrap_to_pi(fleet.target_heading[rows] - fleet.heading[rows])
+        steering_angle = np.arctan(fleet.length[rows] / utils.not_zero(fleet.velocity[rows]) * heading_rate_command)
+        return np.clip(steering_angle, -cls.MAX_STEERING_ANGLE, cls.MAX_STEERING_ANGLE)
+
+    def clip_target_velocity(self, target_velocity):
+        """
+            Restrict a target velocity to the range accepted by the velocity controller.
+
+        :param target_velocity: the desired velocity [m/s]
+        :return: the accepted target velocity [m/s]
+        """
+        return np.clip(target_velocity,
+                       self.fleet.min_target_velocity[self.index], self.fleet.max_target_velocity[self.index])
+
+    def steering_control(self, target_heading):
+        """
+            Steer the spacecraft to follow a given heading.
+
+            The heading error is turned into a heading rate command with a proportional controller, which is then
+            inverted through the kinematics to get a steering angle.
+
+        :param target_heading: the desired heading [rad]
+        :return: a steering wheel angle command [rad]
+        """
+        heading_rate_command = self.KP_HEADING * utils.wrap_to_pi(target_heading - self.heading)
+        steering_angle = np.arctan(self.LENGTH / utils.not_zero(self.velocity) * heading_rate_command)
+        return np.clip(steering_angle, -self.MAX_STEERING_ANGLE, self.MAX_STEERING_ANGLE)
+
+    def velocity_control(self, target_velocity):
+        """
+            Control the velocity of the spacecraft.
+
+            Using a simple proportional controller.
+
+        :param target_velocity: the desired velocity [m/s]
+        :return: an acceleration command [m/s2]
+        """
+        return self.KP_A * (target_velocity - self.velocity)
+
+
+class MDPSpacecraft(ControlledSpacecraft):
+    """
+        A controlled spacecraft with a specified discrete range of allowed target velocities.
+    """
+
+    SPEED_COUNT = 3  # []
+    SPEED_MIN = 50  # [m/s]
+    SPEED_MAX = 70  # [m/s]
+    DELTA_VELOCITY = (SPEED_MAX - SPEED_MIN) / (SPEED_COUNT - 1)  # [m/s]
+
+    def __init__(self,
+                 space,
+                 position,
+                 heading=0,
+                 velocity=0,
+                 target_velocity=None,
+                 target_heading=None,
+                 route=None):
+        super(MDPSpacecraft, self).__init__(space, position, heading, velocity, target_velocity, target_heading, route)
+        self.fleet.min_target_velocity[self.index] = self.SPEED_MIN
+        self.fleet.max_target_velocity[self.index] = self.SPEED_MAX
+        self.target_velocity = self.index_to_speed(self.speed_to_index(self.target_velocity))
+
+    @classmethod
+    def create_many(cls, space, positions, headings, velocities):
+        spacecrafts = super(MDPSpacecraft, cls).create_many(space, positions, headings, velocities)
+        if spacecrafts:
+            rows = slice(spacecrafts[0].index, spacecrafts[-1].index + 1)
+            target_velocity = space.fleet.target_velocity[rows]
+            space.fleet.target_velocity[rows] = cls.index_to_speed(cls.speed_to_index(target_velocity))
+        return spacecrafts
+
+    @property
+    def velocity_index(self):
+        return self.speed_to_index(self.target_velocity)
+
+    @classmethod
+    def index_to_speed(cls, index):
+        """
+            Convert an index among allowed speeds to its corresponding speed
+        :param index: the speed index []
+        :return: the corresponding speed [m/s]
+        """
+        return cls.SPEED_MIN + index * cls.DELTA_VELOCITY
+
+    @classmethod
+    def speed_to_index(cls, speed):
+        """
+            Find the index of the closest speed allowed to a given speed.
+        :param speed: an input speed [m/s], or an array of speeds
+        :return: the index of the closest speed allowed [], or an array of indexes
+        """
+        x = (speed - cls.SPEED_MIN) / (cls.SPEED_MAX - cls.SPEED_MIN)
+        index = np.clip(np.round(x * (cls.SPEED_COUNT - 1)), 0, cls.SPEED_COUNT - 1)
+        return index.astype(int) if np.ndim(index) else int(index)
@@ -1,7 +1,9 @@
-import jax.numpy as np
-from collections import deque
+import itertools
 
-from space_env.logger import Loggable
+import numpy as np
+
+from space_env.logger import ColumnarLog, Loggable
+from space_env.space.fleet import Fleet, FleetColumn
 
 class Spacecraft(Loggable):
     """
@@ -9,9 +11,12 @@ class Spacecraft(Loggable):
 
        The state of the object is propagated depending on its sterring and acceleration  actions
        The spacecraft has a triangle shape
+
+       The dynamical state is stored in a row of a Fleet: the spacecraft is a view on that row. A spacecraft that
+       does not belong to a space yet owns a fleet of its own.
     """
 
-    COLLISION_ENABLED = True
+    COLLISIONS_ENABLED = True
 
     """ Maximum reachable velocity [m/s] """
     MAX_VELOCITY = 70
@@ -21,75 +26,172 @@ class Spacecraft(Loggable):
     WIDTH = 4.0
     """ Range for random initial velocities [m/s] """
     DEFAULT_VELOCITIES = [50, 60]
- 
+    """ Columns of the log of a spacecraft """
+    LOG_DTYPES = {"id": int, "time": float, "x": float, "y": float, "heading": float, "velocity": float,
+                  "steering": float, "acceleration": float, "crashed": bool}
+
+    _ids = itertools.count()
+
+    position = FleetColumn("position")
+    heading = FleetColumn("heading")
+    velocity = FleetColumn("velocity")
+    crashed = FleetColumn("crashed")
+    id = FleetColumn("id")
+
     def __init__(self, space, position, heading=0, velocity=0):
-        sefl.space = space
-        self.position = np.array(position).astype('float')
-        self.heading = heading
-        self.velocity = velocity
-        self.action = {'steering': 0, 'acceleration': 0}
-        self.crashed = False
-        self.log = []
-        self.history = deque(maxlen=30)
+        self.space = space
+        self.fleet, self.index = None, None
+        Fleet(capacity=1).add(self,
+                              id=next(Spacecraft._ids),
+                              position=np.array(position).astype('float'),
+                              heading=heading,
+                              velocity=velocity,
+                              length=self.LENGTH,
+                              width=self.WIDTH,
+                              max_velocity=self.MAX_VELOCITY,
+                              collisions_enabled=self.COLLISIONS_ENABLED)
+        self.log = None
+
+    @classmethod
+    def create_random(cls, space, velocity=None, radius=200):
+        """
+            Create a random spacecraft in a space.
+
+            The spacecraft is placed uniformly in a disc centered on the origin, with a random heading, and a
+            velocity drawn in DEFAULT_VELOCITIES unless specified.
+
+        :param space: the space where the spacecraft is flying
+        :param velocity: initial velocity in [m/s]. If None, will be chosen randomly
+        :param radius: radius of the disc in which the spacecraft is placed [m]
+        :return: A spacecraft with random position, heading and/or velocity
+        """
+        distance = radius * np.sqrt(space.np_random.uniform())
+        angle = space.np_random.uniform(-np.pi, np.pi)
+        heading = space.np_random.uniform(-np.pi, np.pi)
+        if velocity is None:
+            velocity = space.np_random.uniform(cls.DEFAULT_VELOCITIES[0], cls.DEFAULT_VELOCITIES[1])
+        return cls(space, distance * np.array([np.cos(angle), np.sin(angle)]), heading, velocity)
+
+    @classmethod
+    def create_many(cls, space, positions, headings, velocities):
+        """
+            Create many spacecrafts in a space at once, written directly into the fleet of the space.
+
+            A single spacecraft is constructed, and replicated with Fleet.extend().
+
+        :param space: the space where the spacecrafts are flying
+        :param positions: their positions [m], of shape (N, 2)
+        :param headings: their headings [rad], of shape (N,)
+        :param velocities: their velocities [m/s], of shape (N,)
+        :return: the list of new spacecrafts
+        """
+        count = len(positions)
+        if not count:
+            return []
+        prototype = cls(space, [0, 0], heading=0)
+        ids = np.fromiter(itertools.islice(Spacecraft._ids, count), dtype=int, count=count)
+        return space.fleet.extend(prototype, count, id=ids, position=positions, heading=headings,
+                                  velocity=velocities)
+
+    @classmethod
+    def create_random_many(cls, space, positions, velocity=None):
+        """
+            Create many spacecrafts at given positions, with random headings and velocities drawn at once, as in
+            create_random().
+
+        :param space: the space where the spacecrafts are flying
+        :param positions: their positions [m], of shape (N, 2), see space_env.space.scenario
+        :param velocity: initial velocity in [m/s]. If None, will be chosen randomly
+        :return: the list of new spacecrafts
+        """
+        count = len(positions)
+        headings = space.np_random.uniform(-np.pi, np.pi, count)
+        if velocity is None:
+            velocities = space.np_random.uniform(cls.DEFAULT_VELOCITIES[0], cls.DEFAULT_VELOCITIES[1], count)
+        else:
+            velocities = np.full(count, velocity)
+        return cls.create_many(space, positions, headings, velocities)
+
+    @classmethod
+    def create_from(cls, spacecraft):
+        """
+            Create a new spacecraft from an existing one.
+            Only the spacecraft dynamics are copied, other properties are default.
+
+        :param spacecraft: a spacecraft
+        :return: a new spacecraft at the same dynamical state
+        """
+        return cls(spacecraft.space, spacecraft.position, spacecraft.heading, spacecraft.velocity)
+
+    @property
+    def history(self):
+        """
+            The recorded past states of the spacecraft, from the most recent one, see Fleet.get_history().
+        """
+        return self.fleet.get_history(self.index)
+
+    @property
+    def action(self):
+        return {'steering': self.fleet.steering[self.index],
+                'acceleration': self.fleet.acceleration[self.index]}
+
+    @action.setter
+    def action(self, action):
+        self.fleet.steering[self.index] = action['steering']
+        self.fleet.acceleration[self.index] = action['acceleration']
+
+    def act(self, action=None):
+        """
+            Store an action to be repeated.
+
+        :param action: the input action
+        """
+        if action:
+            self.action = action
 
     def step(self, dt):
         """
             Propagate the object state given its actions.
 
-            Integrate a model with a 1st-order response on the steering wheel dynamics.
-            If the object is crashed, the actions are overridden with erratic steering and braking until complete stop.
+            The kinematics are integrated by the fleet the spacecraft is bound to, see Fleet.step(). When a whole
+            space is stepped, all its spacecrafts are propagated at once by Space.step() instead.
 
         :param dt: timestep of integration of the model [s]
         """
-        if self.crashed:
-            self.action['steering'] = 0
-            self.action['acceleration'] = -1.0*self.velocity
-        self.action['steering'] = float(self.action['steering'])
-        self.action['acceleration'] = float(self.action['acceleration'])
-        if self.velocity > self.MAX_VELOCITY:
-            self.action['acceleration'] = min(self.action['acceleration'], 1.0*(self.MAX_VELOCITY - self.velocity))
-        elif self.velocity < -self.MAX_VELOCITY:
-            self.action['acceleration'] = max(self.action['acceleration'], 1.0*(self.MAX_VELOCITY - self.velocity))
+        self.fleet.step(dt, rows=[self.index])
+        if self.space and self.space.record_history:
+            self.fleet.record(rows=[self.index])
 
-        v = self.velocity * np.array([np.cos(self.heading), np.sin(self.heading)])
-        self.position += v * dt
-        self.heading += self.velocity * np.tan(self.action['steering']) / self.LENGTH * dt
-        self.velocity += self.action['acceleration'] * dt
-
-        if self.road:
-            self.lane_index = self.road.network.get_closest_lane_index(self.position)
-            self.lane = self.road.network.get_lane(self.lane_index)
-            if self.road.record_history:
-                self.history.appendleft(self.create_from(self))        
-
-    def check_collision(self, other):
+    def dump(self, time=None):
         """
-            Check for collision with another spacecraft.
+            Append the current state of the spacecraft to its log.
 
-        :param other: the other spacecraft
+        :param time: the simulation time [s], the time of its space by default
         """
-        if not self.COLLISIONS_ENABLED or not other.COLLISIONS_ENABLED or self.crashed or other is self:
-            return
+        if self.log is None:
+            self.log = ColumnarLog(self.LOG_DTYPES, capacity=256)
+        if time is None:
+            time = self.space.time if self.space else 0.0
+        self.log.append(**self.fleet.log_values([self.index], time))
 
-        # Fast spherical pre-check
-        if np.linalg.norm(other.position - self.position) > self.LENGTH:
-            return
+    def get_log(self):
+        """
+            Cast the log of the spacecraft into a pandas DataFrame.
 
-        # Accurate rectangular check
+        :return: the DataFrame of the logged states
+        """
+        return (self.log or ColumnarLog(self.LOG_DTYPES)).to_dataframe()
 
-        # Accurate rectangular check
-        print("Not implemented")
-        if utils.triangles_intersect((self.position , 0.9*self.LENGTH , 0.9*self.WIDTH, self.heading),
-                                     (other.position, 0.9*other.LENGTH, 0.9*other.WIDTH, other.heading)):
-            self.velocity = other.velocity = min([self.velocity, other.velocity], key=abs)
-            self.crashed = other.crashed = True
+    def __repr__(self):
+        return "{} #{}: {}".format(self.__class__.__name__, id(self) % 1000, self.position)
 
 class Obstacle(Spacecraft):
     """
         A motionless obstacle at a given position.
     """
 
-    def __init__(self, road, position, heading=0):
-        super(Obstacle, self).__init__(road, position, velocity=0, heading=heading)
+    def __init__(self, space, position, heading=0):
+        super(Obstacle, self).__init__(space, position, velocity=0, heading=heading)
         self.target_velocity = 0
-        self.LENGTH = self.WIDTH
\ No newline at end of file
+        self.LENGTH = self.WIDTH
+        self.fleet.length[self.index] = self.LENGTH
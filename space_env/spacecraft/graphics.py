@@ -1,6 +1,6 @@
 from __future__ import division, print_function
 
-import itertools
+from collections import OrderedDict
 
 import numpy as np
 import pygame
@@ -19,6 +19,13 @@ class VehicleGraphics(object):
     DEFAULT_COLOR = YELLOW
     EGO_COLOR = GREEN
 
+    """ Resolution of the headings of the cached sprites [rad] """
+    HEADING_RESOLUTION = 2 * np.pi / 180
+    """ Maximum number of cached sprites """
+    SPRITE_CACHE_SIZE = 2048
+
+    _sprites = OrderedDict()
+
     @classmethod
     def display(cls, spacecraft, surface, transparent=False, offscreen=False):
         """
@@ -32,15 +39,58 @@ class VehicleGraphics(object):
         :param offscreen: whether the rendering should be done offscreen or not
         """
         v = spacecraft
-        s = pygame.Surface((surface.pix(v.LENGTH), surface.pix(v.LENGTH)), pygame.SRCALPHA)  # per-pixel alpha
-        rect = (0, surface.pix(v.LENGTH) / 2 - surface.pix(v.WIDTH) / 2, surface.pix(v.LENGTH), surface.pix(v.WIDTH))
-        pygame.draw.rect(s, cls.get_color(v, transparent), rect, 0)
+        cls.blit(surface, v.position, v.heading, v.LENGTH, v.WIDTH, cls.get_color(v, transparent), offscreen)
+
+    @classmethod
+    def blit(cls, surface, position, heading, length, width, color, offscreen=False):
+        """
+            Draw a spacecraft sprite centered on a position, with a single blit of a cached sprite.
+
+        :param surface: the surface to draw the spacecraft on
+        :param position: the spacecraft position [m]
+        :param heading: the spacecraft heading [rad]
+        :param length: the spacecraft length [m]
+        :param width: the spacecraft width [m]
+        :param color: the spacecraft color, as a RGB or RGBA tuple
+        :param offscreen: whether the rendering should be done offscreen or not
+        """
+        sprite = cls.get_sprite(surface.pix(length), surface.pix(width), heading, color, offscreen)
+        x, y = surface.pos2pix(position[0], position[1])
+        surface.blit(sprite, (x - sprite.get_width() // 2, y - sprite.get_height() // 2))
+
+    @classmethod
+    def get_sprite(cls, length, width, heading, color, offscreen=False):
+        """
+            Get the rotated surface of a spacecraft from the sprites cache, or draw it.
+
+            The sprites are keyed by their pixel size, color and heading quantized to HEADING_RESOLUTION, and the
+            least recently used ones are evicted beyond SPRITE_CACHE_SIZE.
+
+        :param length: the spacecraft length [px]
+        :param width: the spacecraft width [px]
+        :param heading: the spacecraft heading [rad]
+        :param color: the spacecraft color, as a RGB or RGBA tuple
+        :param offscreen: whether the rendering should be done offscreen or not
+        :return: the rotated sprite surface
+        """
+        steps = int(round(2 * np.pi / cls.HEADING_RESOLUTION))
+        key = (length, width, int(round(heading / cls.HEADING_RESOLUTION)) % steps, tuple(color), offscreen)
+        sprite = cls._sprites.get(key)
+        if sprite is not None:
+            cls._sprites.move_to_end(key)
+            return sprite
+
+        s = pygame.Surface((length, length), pygame.SRCALPHA)  # per-pixel alpha
+        rect = (0, length / 2 - width / 2, length, width)
+        pygame.draw.rect(s, color, rect, 0)
         pygame.draw.rect(s, cls.BLACK, rect, 1)
         if not offscreen:  # convert_alpha throws errors in offscreen mode TODO() Explain why
             s = pygame.Surface.convert_alpha(s)
-        h = v.heading if abs(v.heading) > 2 * np.pi / 180 else 0
-        sr = pygame.transform.rotate(s, -h * 180 / np.pi)
-        surface.blit(sr, (surface.pos2pix(v.position[0] - v.LENGTH / 2, v.position[1] - v.LENGTH / 2)))
+        sprite = pygame.transform.rotate(s, -key[2] * cls.HEADING_RESOLUTION * 180 / np.pi)
+        cls._sprites[key] = sprite
+        if len(cls._sprites) > cls.SPRITE_CACHE_SIZE:
+            cls._sprites.popitem(last=False)
+        return sprite
 
     @classmethod
     def display_trajectory(cls, states, surface, offscreen=False):
@@ -52,7 +102,8 @@ class VehicleGraphics(object):
         :param offscreen: whether the rendering should be done offscreen or not
         """
         for spacecraft in states:
-            cls.display(spacecraft, surface, transparent=True, offscreen=offscreen)
+            cls.blit(surface, spacecraft.position, spacecraft.heading, spacecraft.LENGTH, spacecraft.WIDTH,
+                     cls.get_color(spacecraft, transparent=True), offscreen)
 
     @classmethod
     def display_history(cls, spacecraft, surface, frequency=3, duration=2, simulation=15, offscreen=False):
@@ -66,12 +117,12 @@ class VehicleGraphics(object):
         :param simulation: simulation frequency
         :param offscreen: whether the rendering should be done offscreen or not
         """
-
-        for v in itertools.islice(spacecraft.history,
-                                  None,
-                                  int(simulation * duration),
-                                  int(simulation / frequency)):
-            cls.display(v, surface, transparent=True, offscreen=offscreen)
+        color = cls.get_color(spacecraft, transparent=True)
+        positions, headings, _ = spacecraft.fleet.get_history(spacecraft.index,
+                                                              stop=int(simulation * duration),
+                                                              step=int(simulation / frequency))
+        for position, heading in zip(positions, headings):
+            cls.blit(surface, position, heading, spacecraft.LENGTH, spacecraft.WIDTH, color, offscreen)
 
     @classmethod
     def get_color(cls, spacecraft, transparent=False):
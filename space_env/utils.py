@@ -1,8 +1,12 @@
-import jax.numpy as np
+import importlib
+
+import numpy as np
 
 EPSILON = 0.1
 
 def not_zero(x):
+    if np.ndim(x):
+        return np.where(np.abs(x) > EPSILON, x, np.where(x > 0, EPSILON, -EPSILON))
     if abs(x) > EPSILON:
         return x
     elif x > 0:
@@ -10,80 +14,183 @@ def not_zero(x):
     else:
         return -EPSILON
 
+def remap(v, x, y):
+    return y[0] + (v-x[0])*(y[1]-y[0])/(x[1]-x[0])
+
 def wrap_to_pi(x):
     return ((x+np.pi) % (2*np.pi)) - np.pi
 
+def triangle_vertices(center, length, width, angle):
+    """
+        Compute the vertices of isocele triangles, given their centroid, length, width and heading.
+
+        The apex points towards the heading, 2/3 of the length ahead of the centroid, and the base is 1/3 of the
+        length behind it. The vertices are listed anti-clockwise.
+
+    :param center: centroids, of shape (..., 2)
+    :param length: lengths, of shape (...)
+    :param width: widths, of shape (...)
+    :param angle: headings, of shape (...)
+    :return: the vertices, of shape (..., 3, 2)
+    """
+    center = np.asarray(center, dtype=float)
+    length, width, angle = np.asarray(length), np.asarray(width), np.asarray(angle)
+    forward = np.stack((np.cos(angle), np.sin(angle)), axis=-1)
+    left = np.stack((-forward[..., 1], forward[..., 0]), axis=-1)
+    apex = center + (2.0/3.0*length)[..., None] * forward
+    base = center - (1.0/3.0*length)[..., None] * forward
+    side = (width / 2)[..., None] * left
+    return np.stack((apex, base + side, base - side), axis=-2)
+
 def triangles_intersect(tri1, tri2):
     """
         Do two isocele triangles intersect?
         We do assume that a corner cannot go through the other triangle in a single timestep
-    :param tri1: (center, length, width, angle)
-    :param tri2: (center, length, width, angle)
+
+        The test is vectorized: each field can hold the parameters of M triangles, in which case M pairs of triangles
+        are tested at once.
+    :param tri1: (center, length, width, angle), of shapes ((M, 2), (M,), (M,), (M,))
+    :param tri2: (center, length, width, angle), of shapes ((M, 2), (M,), (M,), (M,))
+    :return: whether the triangles of each pair intersect, of shape (M,)
+    """
+    return tri_tri_2d(triangle_vertices(*tri1), triangle_vertices(*tri2))
+
+def check_tri_winding(tri, allowReversed):
     """
+        Check that triangles are expressed anti-clockwise.
 
-    (c1, l1, w1, a1) = tri1
-    (c2, l2, w2, a2) = tri2
+    :param tri: triangles vertices, of shape (..., 3, 2)
+    :param allowReversed: whether clockwise triangles should be reordered rather than rejected
+    :return: the anti-clockwise triangles vertices, of shape (..., 3, 2)
+    """
+    tri = np.asarray(tri, dtype=float)
+    reversed_ = _edge_side(tri[..., 0, :], tri[..., 1, :], tri[..., 2, :]) < 0.0
+    if np.any(reversed_):
+        if not allowReversed:
+            raise ValueError("triangle has wrong winding direction")
+        tri = np.where(reversed_[..., None, None], tri[..., [0, 2, 1], :], tri)
+    return tri
 
-    c1, s1 = np.cos(a1), np.sin(a1)
-    c2, s2 = np.cos(a2), np.sin(a2)
+def tri_tri_2d(t1, t2, eps = 0.0, allowReversed = False, onBoundary = True):
+    """
+        Separating-edge test of triangles intersection.
 
-    a1x = 2.0/3.0*l1*c1
-    a1y = 2.0/3.0*l1*s1
-    b1x = 0.0
-    b1y = 0.0
-    c1x = 0.0
-    c1y = 0.0
+        Two triangles do not collide if and only if all the vertices of one of them lay on the external side of an
+        edge of the other. The six edges of every pair are tested at once.
 
-    return False # tri_tri_2d([[a1x, a1y], [b1x, b1y], [c1x, c1y]], [[a2x, a2y], [b2x, b2y], [c2x, c2y]])
+    :param t1: vertices of the first triangles, of shape (..., 3, 2)
+    :param t2: vertices of the second triangles, of shape (..., 3, 2)
+    :param eps: tolerance on the side of an edge the vertices lay on
+    :param allowReversed: whether clockwise triangles are accepted
+    :param onBoundary: whether points on the boundary are considered as colliding
+    :return: whether the triangles of each pair collide, of shape (...)
+    """
+    #Triangles must be expressed anti-clockwise
+    t1s = check_tri_winding(t1, allowReversed)
+    t2s = check_tri_winding(t2, allowReversed)
 
-def check_tri_winding(tri, allowReversed):
-	trisq = np.ones((3,3))
-	trisq[:,0:2] = np.array(tri)
-	detTri = np.linalg.det(trisq)
-	if detTri < 0.0:
-		if allowReversed:
-			a = trisq[2,:].copy()
-			trisq[2,:] = trisq[1,:]
-			trisq[1,:] = a
-		else: raise ValueError("triangle has wrong winding direction")
-	return trisq
+    separated = np.zeros(np.broadcast_shapes(t1s.shape[:-2], t2s.shape[:-2]), dtype=bool)
+    for edges, points in [(t1s, t2s), (t2s, t1s)]:
+        start = edges[..., :, None, :]
+        end = np.roll(edges, -1, axis=-2)[..., :, None, :]
+        side = _edge_side(start, end, points[..., None, :, :])
+        external = side < eps if onBoundary else side <= eps
+        separated |= np.all(external, axis=-1).any(axis=-1)
 
-def tri_tri_2d(t1, t2, eps = 0.0, allowReversed = False, onBoundary = True):
-	#Triangles must be expressed anti-clockwise
-	t1s = check_tri_winding(t1, allowReversed)
-	t2s = check_tri_winding(t2, allowReversed)
- 
-	if onBoundary:
-		#Points on the boundary are considered as colliding
-		chkEdge = lambda x: np.linalg.det(x) < eps
-	else:
-		#Points on the boundary are not considered as colliding
-		chkEdge = lambda x: np.linalg.det(x) <= eps
- 
-	#For edge E of trangle 1,
-	for i in range(3):
-		edge = np.roll(t1s, i, axis=0)[:2,:]
- 
-		#Check all points of trangle 2 lay on the external side of the edge E. If
-		#they do, the triangles do not collide.
-		if (chkEdge(np.vstack((edge, t2s[0]))) and
-			chkEdge(np.vstack((edge, t2s[1]))) and  
-			chkEdge(np.vstack((edge, t2s[2])))):
-			return False
- 
-	#For edge E of trangle 2,
-	for i in range(3):
-		edge = np.roll(t2s, i, axis=0)[:2,:]
- 
-		#Check all points of trangle 1 lay on the external side of the edge E. If
-		#they do, the triangles do not collide.
-		if (chkEdge(np.vstack((edge, t1s[0]))) and
-			chkEdge(np.vstack((edge, t1s[1]))) and  
-			chkEdge(np.vstack((edge, t1s[2])))):
-			return False
- 
-	#The triangles collide
-	return True
+    return ~separated
+
+def _edge_side(start, end, point):
+    """
+        Determinant of [[start, 1], [end, 1], [point, 1]], positive when the point lays on the left of the edge.
+    """
+    return (end[..., 0] - start[..., 0]) * (point[..., 1] - start[..., 1]) - \
+        (end[..., 1] - start[..., 1]) * (point[..., 0] - start[..., 0])
+
+def time_of_impact(tri1, tri2, end1, end2, tolerance, iterations=8):
+    """
+        First contact time of pairs of isocele triangles moving between two poses during a step.
+
+        Unlike triangles_intersect(), a triangle moving through another one within the step is detected. The poses
+        are interpolated linearly in position and heading, and the pairs are tested at once at evenly spaced times,
+        such that no vertex moves more than the tolerance relative to the other triangle between two of them. The
+        first contact is then refined by bisection, which divides the sampling interval by 2 ** iterations. Contacts
+        shallower than the tolerance can be missed.
+
+        The test is vectorized over M pairs, each with its own number of samples.
+    :param tri1: (center, length, width, angle) at the start of the step, of shapes ((M, 2), (M,), (M,), (M,))
+    :param tri2: (center, length, width, angle) at the start of the step, of shapes ((M, 2), (M,), (M,), (M,))
+    :param end1: (center, angle) of the first triangles at the end of the step, of shapes ((M, 2), (M,))
+    :param end2: (center, angle) of the second triangles at the end of the step, of shapes ((M, 2), (M,))
+    :param tolerance: the maximum relative displacement of a vertex between two tested times, of shape (M,)
+    :param iterations: the number of bisections of the first contact
+    :return: the first contact times as a fraction of the step in [0, 1], inf if none, of shape (M,)
+    """
+    motions = []
+    sweep = 0
+    for (center, length, width, angle), (end_center, end_angle) in [(tri1, end1), (tri2, end2)]:
+        center, angle = np.asarray(center, dtype=float), np.asarray(angle, dtype=float)
+        translation, rotation = np.asarray(end_center) - center, wrap_to_pi(np.asarray(end_angle) - angle)
+        radius = np.maximum(2.0/3.0*length, np.hypot(length/3, width/2))
+        sweep = sweep + np.linalg.norm(translation, axis=-1) + radius * np.abs(rotation)
+        motions.append((center, length, width, angle, translation, rotation))
+    count = len(sweep)
+
+    def intersect(pairs, s):
+        return tri_tri_2d(*[triangle_vertices(center[pairs] + s[:, None] * translation[pairs], length[pairs],
+                                              width[pairs], angle[pairs] + s * rotation[pairs])
+                            for center, length, width, angle, translation, rotation in motions])
+
+    samples = np.maximum(np.ceil(sweep / tolerance), 1).astype(int)
+    pairs = np.repeat(np.arange(count), samples + 1)
+    k = np.arange(len(pairs)) - np.repeat(np.cumsum(samples + 1) - (samples + 1), samples + 1)
+    s = k / samples[pairs]
+    hit = intersect(pairs, s)
+    first = np.full(count, np.inf)
+    np.minimum.at(first, pairs[hit], s[hit])
+
+    pairs = np.flatnonzero(np.isfinite(first) & (first > 0))
+    high = first[pairs]
+    low = high - 1 / samples[pairs]
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        hit = intersect(pairs, middle)
+        low, high = np.where(hit, low, middle), np.where(hit, middle, high)
+    first[pairs] = high
+    return first
+
+def closest_approach(position, velocity, t_min=0., t_max=np.inf):
+    """
+        Closed-form closest point of approach of linear relative motions p + v t, within a time interval.
+
+    :param position: relative positions at t = 0, of shape (..., 2)
+    :param velocity: relative velocities, of shape (..., 2)
+    :param t_min: start of the time interval, broadcastable to shape (...)
+    :param t_max: end of the time interval, broadcastable to shape (...)
+    :return: the times of closest approach, and the miss distances, of shape (...)
+    """
+    speed2 = np.einsum('...k,...k->...', velocity, velocity)
+    t = -np.einsum('...k,...k->...', position, velocity) / np.maximum(speed2, 1e-12)
+    t = np.clip(t, t_min, t_max)
+    closest = position + velocity * t[..., None]
+    return t, np.sqrt(np.einsum('...k,...k->...', closest, closest))
+
+def time_to_collision(position, velocity, radius):
+    """
+        Closed-form time at which linear relative motions p + v t first come within a distance.
+
+    :param position: relative positions at t = 0, of shape (..., 2)
+    :param velocity: relative velocities, of shape (..., 2)
+    :param radius: the collision distance, broadcastable to shape (...)
+    :return: the times to collision, 0 if already within the distance and inf if never, of shape (...)
+    """
+    a = np.einsum('...k,...k->...', velocity, velocity)
+    b = np.einsum('...k,...k->...', position, velocity)
+    c = np.einsum('...k,...k->...', position, position) - radius ** 2
+    discriminant = b ** 2 - a * c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (-b - np.sqrt(np.maximum(discriminant, 0))) / a
+    t = np.where((discriminant < 0) | (a <= 0) | (t < 0), np.inf, t)
+    return np.where(c <= 0, 0., t)
 
 def class_from_path(path):
     module_name, class_name = path.rsplit(".", 1)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from space_env.space.space import Space
+from space_env.spacecraft.behavior import IDMSpacecraft, LinearSpacecraft
+
+
+@pytest.mark.parametrize("count", [2, 20, 200])
+def test_act_all_matches_act(count):
+    space = Space(np_random=np.random.RandomState(0))
+    space.spacecrafts = [(IDMSpacecraft if k % 2 else LinearSpacecraft).create_random(space, radius=20 * np.sqrt(count))
+                         for k in range(count)]
+    for spacecraft in space.spacecrafts[::3]:
+        spacecraft.randomize_behavior()
+    fleet = space.fleet
+    IDMSpacecraft.act_all(space)
+    acceleration, steering = fleet.acceleration[:count].copy(), fleet.steering[:count].copy()
+    fleet.acceleration[:count] = fleet.steering[:count] = np.nan
+    for spacecraft in space.spacecrafts:
+        spacecraft.act()
+    assert np.allclose(acceleration, fleet.acceleration[:count], rtol=0, atol=1e-12)
+    assert np.allclose(steering, fleet.steering[:count], rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("model", [IDMSpacecraft, LinearSpacecraft])
+def test_follower_keeps_its_distance(model):
+    space = Space()
+    leader = model(space, [100, 0], 0, 50, target_velocity=50)
+    follower = model(space, [0, 0], 0, 70, target_velocity=70)
+    space.spacecrafts = [leader, follower]
+    for _ in range(30 * 15):
+        space.act()
+        space.step(1 / 15)
+    assert not follower.crashed
+    assert follower.velocity == pytest.approx(leader.velocity, abs=1)
+    assert leader.position[0] - follower.position[0] > model.DISTANCE_WANTED
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from space_env.space.broad_phase import BruteForce, SpatialHashGrid, SweepAndPrune
+
+BROAD_PHASES = [BruteForce(), SweepAndPrune(), SpatialHashGrid(), SpatialHashGrid(cell_size=50)]
+
+
+def brute_force_pairs(positions, radius, groups=None):
+    pairs = set()
+    for i in range(len(positions)):
+        for j in range(i + 1, len(positions)):
+            if np.linalg.norm(positions[j] - positions[i]) <= radius and (groups is None or groups[i] == groups[j]):
+                pairs.add((i, j))
+    return pairs
+
+
+@pytest.mark.parametrize("broad_phase", BROAD_PHASES, ids=lambda b: type(b).__name__)
+@pytest.mark.parametrize("count", [0, 1, 5, 40, 300])
+@pytest.mark.parametrize("radius", [10, 75, 300, np.inf])
+@pytest.mark.parametrize("grouped", [False, True])
+def test_pairs_match_brute_force(broad_phase, count, radius, grouped):
+    rng = np.random.default_rng(count)
+    positions = rng.uniform(-1000, 1000, size=(count, 2))
+    groups = rng.integers(3, size=count) if grouped else None
+    i, j = broad_phase.pairs(positions, radius, groups)
+    assert np.all(i < j)
+    assert len(set(zip(i, j))) == len(i)
+    assert set(zip(i, j)) == brute_force_pairs(positions, radius, groups)
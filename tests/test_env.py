@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from space_env.envs.space_env import SpaceEnv
+
+CONFIGS = [
+    {"spacecrafts_count": 10},
+    {"spacecrafts_count": 10, "observation": {"type": "Kinematics", "copy": False}},
+    {"spacecrafts_count": 10, "observation": {"type": "TimeToCollision"}},
+    {"spacecrafts_count": 10, "multi_agent": True, "controlled_spacecrafts": 2},
+    {"spacecrafts_count": 10, "show_trajectories": True},
+]
+
+
+def make_env(config, seed=0):
+    env = SpaceEnv(config)
+    env.seed(seed)
+    env.reset()
+    return env
+
+
+def random_actions(env, count, seed=0):
+    env.action_space.seed(seed)
+    return [env.action_space.sample() for _ in range(count)]
+
+
+def rollout(env, actions):
+    trajectory = []
+    for action in actions:
+        obs, reward, terminal, _ = env.step(action)
+        trajectory.append((np.array(obs), np.array(reward), np.array(terminal)))
+    return trajectory
+
+
+def assert_same(trajectory, other):
+    assert len(trajectory) == len(other)
+    for step, other_step in zip(trajectory, other):
+        for value, other_value in zip(step, other_step):
+            assert np.array_equal(value, other_value)
+
+
+@pytest.mark.parametrize("config", CONFIGS)
+def test_set_state_replays_trajectory(config):
+    env = make_env(config)
+    rollout(env, random_actions(env, 3, seed=1))
+    state = env.get_state()
+    actions = random_actions(env, 10)
+    trajectory = rollout(env, actions)
+    rollout(env, random_actions(env, 5, seed=2))
+    env.set_state(state)
+    assert_same(rollout(env, actions), trajectory)
+
+
+def test_set_state_restores_history():
+    env = make_env({"spacecrafts_count": 5, "show_trajectories": True})
+    rollout(env, random_actions(env, 2))
+    fleet = env.space.fleet
+    state = env.get_state()
+    head, size = fleet.history_head[:fleet.count].copy(), fleet.history_size[:fleet.count].copy()
+    env.set_state(state)
+    assert np.array_equal(fleet.history_head[:fleet.count], head)
+    assert np.array_equal(fleet.history_size[:fleet.count], size)
+
+
+@pytest.mark.parametrize("config", CONFIGS)
+def test_clone_replays_trajectory(config):
+    env = make_env(config)
+    rollout(env, random_actions(env, 3, seed=1))
+    obs = env.observation.observe()
+    expected_obs = np.array(obs)
+    clone = env.clone()
+    actions = random_actions(env, 10)
+    trajectory = rollout(clone, actions)
+    assert np.array_equal(obs, expected_obs)
+    assert np.array_equal(env.observation.observe(), expected_obs)
+    assert_same(rollout(env, actions), trajectory)
+
+
+def test_reset_follows_spaces_config():
+    env = make_env({"spacecrafts_count": 5})
+    env.configure({"multi_agent": True, "controlled_spacecrafts": 2})
+    obs = env.reset()
+    assert env.action_space.shape == (2,)
+    assert obs.shape == env.observation_space.shape == (2, 5, 5)
+    env.configure({"controlled_spacecrafts": 3})
+    obs = env.reset()
+    assert env.action_space.shape == (3,)
+    assert obs.shape == env.observation_space.shape == (3, 5, 5)
+    env.configure({"observation": {"type": "TimeToCollision"}, "multi_agent": False, "policy_frequency": 2})
+    obs = env.reset()
+    assert obs.shape == env.observation_space.shape
+    assert env.observation_space.shape[-1] == 20
+
+
+def test_reset_follows_simulation_frequency():
+    env = make_env({"spacecrafts_count": 2})
+    env.configure({"simulation_frequency": 5})
+    env.reset()
+    env.step(1)
+    assert env.SIMULATION_FREQUENCY == 5
+    assert env.time == 5
+    env.configure({"simulation_frequency": None})
+    env.reset()
+    assert env.SIMULATION_FREQUENCY == SpaceEnv.SIMULATION_FREQUENCY
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from space_env.space.space import Space
+from space_env.spacecraft.dynamics import Spacecraft
+
+
+def integrate(integrator, substeps, duration=1.0):
+    """
+        Integrate spacecrafts with constant commands, and return their final poses.
+    """
+    space = Space(integrator=integrator)
+    space.spacecrafts = [Spacecraft(space, [0, 0], heading, velocity)
+                         for heading, velocity in [(0, 10), (1, 20), (-2, 5)]]
+    fleet = space.fleet
+    fleet.sync()
+    steering, acceleration = np.array([0.3, -0.1, 0.5]), np.array([2.0, -3.0, 1.0])
+    for _ in range(substeps):
+        fleet.steering[:fleet.count] = steering
+        fleet.acceleration[:fleet.count] = acceleration
+        fleet.step(duration / substeps)
+    return fleet.position[:fleet.count].copy(), fleet.heading[:fleet.count].copy()
+
+
+@pytest.mark.parametrize("substeps", [1, 3, 15])
+def test_arc_integration_is_exact(substeps):
+    position, heading = integrate("arc", substeps)
+    reference_position, reference_heading = integrate("rk4", 2000)
+    assert np.allclose(position, reference_position, rtol=0, atol=1e-6)
+    assert np.allclose(heading, reference_heading, rtol=0, atol=1e-9)
+
+
+def test_rk4_converges():
+    reference, _ = integrate("arc", 1)
+    errors = [np.abs(integrate("rk4", substeps)[0] - reference).max() for substeps in (5, 10)]
+    assert errors[1] < errors[0] / 10
+    assert np.abs(integrate("euler", 15)[0] - reference).max() > errors[0]
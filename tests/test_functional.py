@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from space_env.envs.space_env import SpaceEnv
+
+functional = pytest.importorskip("space_env.space.functional")
+
+
+def crashed_state(crashed):
+    env = SpaceEnv({"spacecrafts_count": 4})
+    env.seed(0)
+    env.reset()
+    fleet = env.space.fleet
+    fleet.sync()
+    agents = np.zeros(fleet.count, dtype=bool)
+    agents[env.spacecraft.index] = True
+    fleet.crashed[np.flatnonzero(agents if crashed == "agent" else ~agents)[0]] = True
+    return functional.from_fleet(fleet), agents
+
+
+@pytest.mark.parametrize("crashed, performed", [("agent", 1), ("other", 10)])
+def test_simulate_halts_on_agent_crash(crashed, performed):
+    state, agents = crashed_state(crashed)
+    actions = np.full(len(agents), functional.IDLE)
+    final, steps = functional.simulate(state, actions, agents, 1 / 15, substeps=10)
+    assert int(steps) == performed
+
+
+def test_simulate_in_double_precision():
+    state, agents = crashed_state("other")
+    actions = np.full(len(agents), functional.IDLE)
+    final, _ = functional.simulate(state, actions, agents, 1 / 15, substeps=10)
+    assert final.position.dtype == np.float64
+    assert final.heading.dtype == np.float64
+
+
+JIT_CONFIG = {"spacecrafts_count": 4, "jit_simulation": True,
+              "other_spacecrafts_type": "space_env.spacecraft.control.ControlledSpacecraft"}
+
+
+def test_compiled_env_steps():
+    env = SpaceEnv(JIT_CONFIG)
+    env.seed(0)
+    env.reset()
+    for _ in range(3):
+        obs, _, _, _ = env.step(1)
+    assert obs.shape == env.observation_space.shape
+    assert env.time > 0
+
+
+@pytest.mark.parametrize("config", [{"integrator": "rk4"}, {"continuous_collisions": True},
+                                    {"show_trajectories": True},
+                                    {"other_spacecrafts_type": "space_env.spacecraft.behavior.IDMSpacecraft"}])
+def test_compiled_env_rejects_unsupported_config(config):
+    with pytest.raises(ValueError):
+        SpaceEnv(dict(JIT_CONFIG, **config))
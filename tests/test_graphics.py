@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from space_env.envs.space_env import SpaceEnv
+
+pytest.importorskip("pygame")
+
+
+def make_env():
+    env = SpaceEnv({"spacecrafts_count": 3, "offscreen_rendering": True})
+    env.seed(0)
+    env.reset()
+    return env
+
+
+def test_record_offscreen(monkeypatch, tmp_path):
+    monkeypatch.setenv("SDL_VIDEODRIVER", "offscreen")
+    env = make_env()
+    path = str(tmp_path / "frames.npz")
+    env.start_recording(path)
+    for _ in range(2):
+        env.step(1)
+    env.stop_recording()
+    env.close()
+    with np.load(path) as frames:
+        assert len(frames.files) > 0
+        assert all(np.any(frames[name]) for name in frames.files)
+
+
+def test_record_disabled_viewer(monkeypatch, tmp_path):
+    monkeypatch.setenv("SDL_VIDEODRIVER", "dummy")
+    env = make_env()
+    with pytest.raises(RuntimeError):
+        env.start_recording(str(tmp_path / "frames.npz"))
+    env.close()
@@ -0,0 +1,23 @@
+import numpy as np
+
+from space_env.logger import ColumnarLog
+from space_env.space.space import Space
+from space_env.spacecraft.dynamics import Obstacle
+
+
+def test_append_batches_and_scalars():
+    log = ColumnarLog({"time": float, "x": float}, capacity=1)
+    log.append(time=0., x=np.arange(3.))
+    log.append(time=1., x=5.)
+    log.append(time=2., x=np.zeros(0))
+    assert len(log) == 4
+    assert np.array_equal(log.columns["time"][:log.count], [0, 0, 0, 1])
+    assert np.array_equal(log.columns["x"][:log.count], [0, 1, 2, 5])
+
+
+def test_dump_without_spacecrafts():
+    space = Space()
+    space.dump()
+    space.spacecrafts = [Obstacle(space, [0, 0])]
+    space.dump()
+    assert len(space.log) == 0
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from space_env.envs.space_env import SpaceEnv
+from space_env.space.space import Space
+from space_env.spacecraft.dynamics import Spacecraft
+
+
+def rollout(config, seed=0, steps=20):
+    env = SpaceEnv(config)
+    env.seed(seed)
+    env.reset()
+    rng = np.random.default_rng(seed)
+    crashes = []
+    for _ in range(steps):
+        env.step(rng.integers(env.action_space.n))
+        fleet = env.space.fleet
+        fleet.sync()
+        crashes.append(fleet.crashed[:fleet.count].copy())
+    return env, np.array(crashes)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_adaptive_time_step_matches_checking_every_step(seed):
+    config = {"spacecrafts_count": 15, "spawn_radius": 100, "duration": 100}
+    env, crashes = rollout(config, seed)
+    adaptive_env, adaptive_crashes = rollout(dict(config, adaptive_time_step=True), seed)
+    fleet, adaptive_fleet = env.space.fleet, adaptive_env.space.fleet
+    assert crashes.any()
+    assert np.array_equal(crashes, adaptive_crashes)
+    assert np.array_equal(fleet.position[:fleet.count], adaptive_fleet.position[:adaptive_fleet.count])
+    assert np.array_equal(fleet.velocity[:fleet.count], adaptive_fleet.velocity[:adaptive_fleet.count])
+
+
+def test_safe_duration_is_safe():
+    env = SpaceEnv({"spacecrafts_count": 15, "spawn_radius": 100})
+    env.seed(0)
+    env.reset()
+    space, dt = env.space, 1 / env.SIMULATION_FREQUENCY
+    for _ in range(100):
+        safe_duration = space.safe_duration(1.0, dt)
+        for _ in range(int(safe_duration / dt)):
+            space.act()
+            space.step(dt)
+            assert not len(space.contacts[0])
+        space.act()
+        space.step(dt)
+
+
+@pytest.mark.parametrize("continuous_collisions", [False, True])
+def test_head_on_collision_history(continuous_collisions):
+    space = Space(continuous_collisions=continuous_collisions, record_history=True)
+    space.spacecrafts = [Spacecraft(space, [0, 0], 0, 70), Spacecraft(space, [100, 0], np.pi, 70)]
+    fleet = space.fleet
+    fleet.sync()
+    fleet.acceleration[:2] = fleet.steering[:2] = 0
+    space.step(1.0)
+    i, j, t = space.contacts
+    if continuous_collisions:
+        assert (list(i), list(j)) == ([0], [1])
+        assert t[0] == pytest.approx(0.637, abs=1e-3)
+        assert fleet.crashed[:2].all()
+    else:
+        assert not len(i) and not fleet.crashed[:2].any()
+    # The history holds the final poses, after the colliding spacecrafts are rewound to their contact poses
+    assert np.array_equal(fleet.get_history(0, 1)[0][0], fleet.position[0])
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from space_env.space.broad_phase import BruteForce
+from space_env.space.spatial_index import SpatialIndex
+
+
+@pytest.mark.parametrize("count", [0, 1, 5, 40, 300])
+@pytest.mark.parametrize("radius", [10, 75, 300, np.inf])
+def test_pairs_match_brute_force(count, radius):
+    positions = np.random.default_rng(count).uniform(-1000, 1000, size=(count, 2))
+    pairs = set(zip(*SpatialIndex(positions).pairs(radius)))
+    assert pairs == set(zip(*BruteForce().pairs(positions, radius)))
+
+
+def test_nearest_ahead():
+    positions = np.array([[0, 0], [50, 1], [20, -30], [-40, 0], [300, 0]])
+    directions = np.array([[1, 0], [1, 0], [0, 1], [-1, 0], [-1, 0]])
+    leaders, distances = SpatialIndex(positions).nearest_ahead(directions, 300, 5)
+    assert np.array_equal(leaders, [1, 4, -1, -1, 1])
+    assert np.allclose(distances, [50, 250, np.inf, np.inf, 250])
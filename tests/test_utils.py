@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from space_env import utils
+
+
+def scalar_tri_tri_2d(t1, t2, eps=0.0, allowReversed=False, onBoundary=True):
+    """
+        Separating-edge test of a single pair of triangles, with 3x3 determinants.
+    """
+    def winding(tri):
+        trisq = np.ones((3, 3))
+        trisq[:, 0:2] = np.array(tri)
+        if np.linalg.det(trisq) < 0.0:
+            if not allowReversed:
+                raise ValueError("triangle has wrong winding direction")
+            trisq[[1, 2]] = trisq[[2, 1]]
+        return trisq
+
+    def separated(edge, points):
+        dets = [np.linalg.det(np.vstack((edge, point))) for point in points]
+        return all(d < eps for d in dets) if onBoundary else all(d <= eps for d in dets)
+
+    t1s, t2s = winding(t1), winding(t2)
+    for ts, other in [(t1s, t2s), (t2s, t1s)]:
+        for i in range(3):
+            if separated(np.roll(ts, i, axis=0)[:2, :], other):
+                return False
+    return True
+
+
+@pytest.mark.parametrize("on_boundary", [True, False])
+def test_tri_tri_2d_matches_scalar(on_boundary):
+    rng = np.random.default_rng(0)
+    t1 = rng.uniform(-10, 10, size=(500, 3, 2))
+    t2 = rng.uniform(-10, 10, size=(500, 3, 2))
+    collide = utils.tri_tri_2d(t1, t2, allowReversed=True, onBoundary=on_boundary)
+    expected = [scalar_tri_tri_2d(a, b, allowReversed=True, onBoundary=on_boundary) for a, b in zip(t1, t2)]
+    assert collide.shape == (500,)
+    assert np.array_equal(collide, expected)
+    assert 0 < collide.sum() < 500
+
+
+def test_tri_tri_2d_winding():
+    tri = np.array([[0, 0], [1, 0], [0, 1]])
+    assert utils.tri_tri_2d(tri, tri + 0.5)
+    assert not utils.tri_tri_2d(tri, tri + 2)
+    with pytest.raises(ValueError):
+        utils.tri_tri_2d(tri[[0, 2, 1]], tri)
+
+
+def test_triangles_intersect():
+    center = np.array([[0, 0], [0, 0]])
+    other = np.array([[5, 0], [50, 0]])
+    length, width, angle = np.full(2, 10.), np.full(2, 5.), np.zeros(2)
+    hit = utils.triangles_intersect((center, length, width, angle), (other, length, width, angle + np.pi))
+    assert np.array_equal(hit, [True, False])
+
+
+def test_time_of_impact_head_on_tunnelling():
+    length, width = np.array([9.]), np.array([4.])
+    start1, start2 = (np.array([[0., 0.]]), length, width, np.array([0.])), \
+        (np.array([[100., 0.]]), length, width, np.array([np.pi]))
+    end1, end2 = (np.array([[70., 0.]]), np.array([0.])), (np.array([[30., 0.]]), np.array([np.pi]))
+    assert not utils.triangles_intersect((end1[0], length, width, end1[1]), (end2[0], length, width, end2[1]))[0]
+    t = utils.time_of_impact(start1, start2, end1, end2, tolerance=np.array([0.1]))
+    # The apexes meet when the spacecrafts have travelled (100 - 2 * 2/3 * 9) / 2 m each
+    assert t[0] == pytest.approx((100 - 12) / 140, abs=1e-3)
@@ -0,0 +1,70 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from space_env.envs.space_env import SpaceEnv
+from space_env.envs.subproc_vec_env import SubprocVecEnv
+from space_env.envs.vec_env import SpaceVecEnv
+
+
+@pytest.mark.parametrize("config", [{"spacecrafts_count": 5, "duration": 8},
+                                    {"spacecrafts_count": 5, "duration": 8, "continuous_collisions": True}])
+def test_vec_env_matches_independent_envs(config):
+    count, seed = 4, 3
+    vec_env = SpaceVecEnv(count, config)
+    vec_env.seed(seed)
+    observations = vec_env.reset()
+    envs = [SpaceEnv(config) for _ in range(count)]
+    for k, env in enumerate(envs):
+        env.seed(seed + k)
+    assert np.allclose(observations, [env.reset() for env in envs])
+
+    rng = np.random.default_rng(0)
+    for _ in range(30):
+        actions = rng.integers(vec_env.action_space.n, size=count)
+        observations, rewards, terminals, _ = vec_env.step(actions)
+        for k, (env, action) in enumerate(zip(envs, actions)):
+            obs, reward, terminal, _ = env.step(action)
+            if terminal:
+                obs = env.reset()
+            assert np.allclose(observations[k], obs)
+            assert rewards[k] == pytest.approx(reward)
+            assert terminals[k] == terminal
+
+
+@pytest.mark.parametrize("config", [{"multi_agent": True}, {"jit_simulation": True}, {"profile": True},
+                                    {"render_substeps": 2}, {"log_path": "log.parquet"}])
+def test_vec_env_rejects_unsupported_config(config):
+    with pytest.raises(ValueError):
+        SpaceVecEnv(2, config)
+
+
+def test_subproc_vec_env_matches_vec_env():
+    config = {"spacecrafts_count": 5, "duration": 8}
+    count, seed = 4, 3
+    vec_env = SpaceVecEnv(count, config)
+    subproc_env = SubprocVecEnv(count, config, num_workers=2, start_method="spawn")
+    try:
+        assert subproc_env.seed(seed) == vec_env.seed(seed)
+        assert np.array_equal(subproc_env.reset(), vec_env.reset())
+        rng = np.random.default_rng(0)
+        for _ in range(12):
+            actions = rng.integers(vec_env.action_space.n, size=count)
+            observations, rewards, terminals, infos = subproc_env.step(actions)
+            expected_observations, expected_rewards, expected_terminals, expected_infos = vec_env.step(actions)
+            assert np.array_equal(observations, expected_observations)
+            assert np.array_equal(rewards, expected_rewards)
+            assert np.array_equal(terminals, expected_terminals)
+            assert [sorted(info) for info in infos] == [sorted(info) for info in expected_infos]
+    finally:
+        subproc_env.close()
+        vec_env.close()
+    assert subproc_env.closed
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=subproc_env.shm.name)
+
+
+def test_subproc_vec_env_rejects_unsupported_config():
+    with pytest.raises(ValueError):
+        SubprocVecEnv(2, {"log_path": "log.parquet"}, num_workers=1)